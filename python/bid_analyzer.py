@@ -2,80 +2,69 @@
 AI Bid Analyzer - Uses Ollama to determine if IT consultancy should bid on tender
 """
 
+import atexit
+import hashlib
 import logging
+import os
+import queue
+import re
+import shelve
+import threading
+import orjson
 import requests
-import json
-from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Literal, Tuple
 from datetime import datetime
 
+from csv_output import CSVOutput
+
 logger = logging.getLogger(__name__)
 
+# Ollama server settings - keep_alive pins the model in memory between calls
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+# Concurrent analyses default to the server's parallel slots (OLLAMA_NUM_PARALLEL),
+# or 1 for a stock `ollama serve`; extra requests only queue on the server
+OLLAMA_CONCURRENCY = int(os.getenv('OLLAMA_CONCURRENCY', os.getenv('OLLAMA_NUM_PARALLEL', '1')))
+# Seconds to wait for the first streamed byte, including time queued behind other requests
+OLLAMA_READ_TIMEOUT = int(os.getenv('OLLAMA_READ_TIMEOUT', '300'))
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Output token cap - room for the reasoning text and relevant_factors list
+OLLAMA_NUM_PREDICT = int(os.getenv('OLLAMA_NUM_PREDICT', '512'))
 
-def analyze_tender_for_bid(combined_record: Dict[str, Any], model: str = "llama3.1:8b") -> Dict[str, Any]:
-    """
-    Analyze a combined tender record to determine if IT consultancy should bid.
-    
-    Args:
-        combined_record: Combined record with tender, pdf, and cpv data
-        model: Ollama model to use
-        
-    Returns:
-        Analysis result with bid recommendation and reasoning
-    """
-    # Build context for AI
-    tender = combined_record.get('tender', {})
-    pdf = combined_record.get('pdf', {})
-    cpv = combined_record.get('cpv', {})
-    
-    resource_id = combined_record.get('resource_id', 'unknown')
-    
-    # Parse CPV codes if they're strings (from CSV)
-    cpv_codes = cpv.get('cpv_codes', []) if cpv else []
-    if isinstance(cpv_codes, str):
-        import ast
-        try:
-            cpv_codes = ast.literal_eval(cpv_codes)
-        except:
-            cpv_codes = []
-    
-    cpv_count = cpv.get('cpv_count', 0) if cpv else 0
-    has_validated = cpv.get('has_validated_cpv', False) if cpv else False
-    
-    logger.info(f"Analyzing tender {resource_id}: {cpv_count} CPV codes found, validated={has_validated}")
-    
-    # Extract PDF content sections for detailed analysis
-    pdf_content = pdf.get('pdf_content', {}) if pdf else {}
-    
-    # Handle both dict and JSON string formats
-    if isinstance(pdf_content, str):
-        import json
-        try:
-            pdf_content = json.loads(pdf_content) if pdf_content else {}
-        except (json.JSONDecodeError, ValueError):
-            pdf_content = {}
-    
-    # Include FULL PDF content, not truncated
-    pdf_sections = "\n".join([
-        f"{heading}: {str(text)}" 
-        for heading, text in pdf_content.items() 
-        if text and str(text).strip()
-    ]) if pdf_content else "No PDF content available"
-    
-    context = f"""
-You are a bid qualification analyst for Version 1, a technology consultancy company specializing in enterprise software, cloud services, data platforms, and IT modernization.
+# Shared HTTP session - reuses keep-alive connections to Ollama across calls and threads
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
-TENDER DETAILS:
-Title: {tender.get('title', 'N/A')}
-Contracting Authority: {tender.get('contracting_authority', 'N/A')}
-Estimated Value: {tender.get('estimated_value', 'N/A')}
-Info: {tender.get('info', 'N/A')}
-Main Classification: {pdf.get('main_classification', 'N/A') if pdf else 'N/A'}
-CPV Codes Found: {cpv_count}
-CPV Codes: {cpv_codes}
-Has Validated IT/Software CPV: {has_validated}
+# Quantized instruct model - bid qualification is a small JSON classification task
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1:8b-instruct-q4_K_M')
 
-FULL PDF CONTENT (all sections):
-{pdf_sections}
+# Markdown code fences sometimes wrapped around the model's JSON response (fallback only)
+_JSON_FENCE_HEAD = re.compile(r'^```json\s*\n')
+_JSON_FENCE_TAIL = re.compile(r'\n```\s*$')
+
+# Decision fields near the start of a streamed response, used for early exit
+_SHOULD_BID_RE = re.compile(r'"should_bid"\s*:\s*(true|false)')
+_CONFIDENCE_RE = re.compile(r'"confidence"\s*:\s*"(high|medium|low)"', re.IGNORECASE)
+
+# CPV codes in stringified lists from CSV, e.g. "['72000000', '48000000']"
+_CPV_RE = re.compile(r'\d{8}')
+
+# Prompt budget for PDF content - prefill time grows with prompt length
+MAX_SECTION_CHARS = 2000
+MAX_PDF_CHARS = 32000
+PRIORITY_SECTIONS = re.compile(r'scope|requirement|service|specification|technical', re.IGNORECASE)
+
+# Combined-record fields read by analyze_tender_for_bid, for column-pruned loads
+ANALYSIS_COLUMNS = {
+    'tender': ['title', 'contracting_authority', 'estimated_value', 'info'],
+    'pdf': ['pdf_content', 'main_classification'],
+    'cpv': ['cpv_codes', 'cpv_count', 'has_validated_cpv']
+}
+
+# Static instructions are sent as the Ollama system prompt so the server can
+# reuse its KV cache across requests; only the tender details vary per call
+_PROMPT_HEADER = """You are a bid qualification analyst for Version 1, a technology consultancy company specializing in enterprise software, cloud services, data platforms, and IT modernization.
 
 TENDER SHOULD BE RECOMMENDED (should_bid=true) IF IT INCLUDES ANY OF:
 ✓ Software development, customization, or modernization
@@ -104,7 +93,9 @@ TENDER CAN BE REJECTED (should_bid=false) IF IT IS CLEARLY:
 ❌ HR/recruitment for non-IT roles
 ❌ Generic management consulting with NO technology component
 
-IMPORTANT CONSIDERATIONS:
+"""
+
+_CONSIDERATIONS_LENIENT = """IMPORTANT CONSIDERATIONS:
 - IT hardware tenders are ACCEPTABLE if they include implementation, integration, or support services
 - Tenders mentioning "software", "cloud", "data", "digital", "systems", "IT", or "technology" should be considered carefully
 - Mixed tenders (hardware + software + services) are GOOD candidates
@@ -118,44 +109,381 @@ DECISION PROCESS:
 4. Assess if Version 1's capabilities (software, cloud, data, IT consulting) match the tender
 5. If there's ANY significant IT component, recommend the bid
 
-Return ONLY valid JSON:
-{{
+"""
+
+_CONSIDERATIONS_STRICT = """IMPORTANT CONSIDERATIONS:
+- IT hardware tenders are ACCEPTABLE only if implementation, integration, or support services are a substantial part of the contract
+- Only recommend tenders where software, IT services, or data work is a core deliverable
+- Mixed tenders (hardware + software + services) are candidates only when the software/services component is significant
+- Validated IT CPV codes are supporting evidence, not sufficient on their own
+- When in doubt about IT relevance, do NOT recommend the bid
+
+DECISION PROCESS:
+1. Check title and main classification for IT/technology keywords
+2. Review full PDF content for technical requirements, software mentions, IT services
+3. Consider validated CPV codes as supporting evidence
+4. Assess if Version 1's capabilities (software, cloud, data, IT consulting) match the tender
+5. Recommend the bid only if IT work is a core part of the contract
+
+"""
+
+_PROMPT_SCHEMA = """Return ONLY valid JSON:
+{
   "should_bid": true/false,
   "confidence": "high/medium/low",
   "reasoning": "Clear explanation of why this tender is/isn't a good fit for Version 1",
   "relevant_factors": ["Key factors that influenced the decision"],
   "estimated_fit": "0-100 (how well this matches Version 1's capabilities)"
-}}
+}
 
 For IT-related tenders, set estimated_fit to 60-100 based on alignment with Version 1's expertise.
 For non-IT tenders, set estimated_fit to 0-30.
 """
+
+_PROMPT_LENIENT = _PROMPT_HEADER + _CONSIDERATIONS_LENIENT + _PROMPT_SCHEMA
+_PROMPT_STRICT = _PROMPT_HEADER + _CONSIDERATIONS_STRICT + _PROMPT_SCHEMA
+
+# Lenient errs towards recommending (we can filter later); strict only recommends core IT work
+SYSTEM_PROMPTS = {'strict': _PROMPT_STRICT, 'lenient': _PROMPT_LENIENT}
+
+USER_PROMPT_TEMPLATE = """TENDER DETAILS:
+Title: {title}
+Contracting Authority: {contracting_authority}
+Estimated Value: {estimated_value}
+Info: {info}
+Main Classification: {main_classification}
+CPV Codes Found: {cpv_count}
+CPV Codes: {cpv_codes}
+Has Validated IT/Software CPV: {has_validated}
+
+PDF CONTENT (most relevant sections):
+{pdf_sections}
+"""
+
+# Keyword pre-filter - clear-cut tenders are decided without an LLM call
+IT_KEYWORDS = re.compile(
+    r'\b(software|cloud|digital|ict|information technology|information systems?|'
+    r'cyber\s?security|devops|saas|erp|crm|databases?|apis?|analytics|data (?:centres?|centers?|'
+    r'analytics|platforms?|warehouse|migration|protection)|web\s?(?:sites?|development|applications?)|(?:web|online) portals?|'
+    r'network (?:infrastructure|equipment|security)|hosting|software licen[cs](?:e|es|ing))\b',
+    re.IGNORECASE
+)
+# The "IT" acronym is matched case-sensitively so the pronoun "it" never counts
+IT_ACRONYM = re.compile(r'\bIT\b')
+REJECT_KEYWORDS = re.compile(
+    r'\b(furniture|catering|canteen|food|cleaning|janitorial|construction|building works|'
+    r'refurbishment|roofing|painting|landscaping|grounds maintenance|school supplies|'
+    r'stationery|office supplies|vehicles?|fuel|pharmaceuticals?|medical supplies|'
+    r'agricultur\w*|farming|printing|uniforms|waste collection|security guard\w*)\b',
+    re.IGNORECASE
+)
+# CPV divisions for works/goods the company never bids on
+# (03 agriculture, 15 food, 33 medical, 39 furniture, 45 construction, 55 catering, 90 cleaning/waste)
+REJECT_CPV_PREFIXES = ('03', '15', '33', '39', '45', '55', '90')
+
+# Persistent analysis cache - re-issued tenders reuse the earlier LLM result
+BID_CACHE_FILE = os.getenv('BID_CACHE_FILE', '.bid_cache.db')
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def _get_cache() -> shelve.Shelf:
+    """Open the analysis cache on first use; call with _CACHE_LOCK held."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = shelve.open(BID_CACHE_FILE)
+        atexit.register(_CACHE.close)
+    return _CACHE
+
+
+def prefilter_tender(title: str, cpv_codes: List[str], has_validated: bool) -> Dict[str, Any]:
+    """
+    Decide clear-cut tenders from title and CPV codes without calling the LLM.
+    
+    Args:
+        title: Tender title
+        cpv_codes: List of CPV code strings
+        has_validated: Whether the tender has a validated IT/software CPV code
+        
+    Returns:
+        Partial analysis dict if the tender can be decided, None otherwise
+    """
+    it_match = IT_KEYWORDS.search(title) or IT_ACRONYM.search(title)
     
+    if has_validated and it_match:
+        return {
+            'should_bid': True,
+            'confidence': 0.90,
+            'reasoning': f"Validated IT CPV code and IT keyword match ('{it_match.group(0)}') in title",
+            'relevant_factors': ['validated IT CPV code', f"title keyword: {it_match.group(0)}"],
+            'estimated_fit': 0.80
+        }
+    
+    if has_validated or it_match:
+        return None
+    
+    reject_match = REJECT_KEYWORDS.search(title)
+    if reject_match:
+        return {
+            'should_bid': False,
+            'confidence': 0.90,
+            'reasoning': f"Non-IT tender - title matches excluded category ('{reject_match.group(0)}') and no validated IT CPV code",
+            'relevant_factors': [f"title keyword: {reject_match.group(0)}"],
+            'estimated_fit': 0.10
+        }
+    
+    if cpv_codes and all(str(code).startswith(REJECT_CPV_PREFIXES) for code in cpv_codes):
+        return {
+            'should_bid': False,
+            'confidence': 0.90,
+            'reasoning': 'Non-IT tender - all CPV codes are in excluded divisions and no validated IT CPV code',
+            'relevant_factors': [f"CPV code: {code}" for code in cpv_codes],
+            'estimated_fit': 0.10
+        }
+    
+    return None
+
+
+def build_pdf_sections(pdf_content: Dict[str, Any]) -> str:
+    """
+    Format PDF content sections for the prompt within the character budget.
+    
+    Sections whose heading mentions scope, requirements, services,
+    specification or technical details are included first. Each section is
+    capped at MAX_SECTION_CHARS and the result at MAX_PDF_CHARS.
+    
+    Args:
+        pdf_content: PDF content organized by heading
+        
+    Returns:
+        Formatted sections, or a placeholder if there is no content
+    """
+    if not pdf_content:
+        return "No PDF content available"
+    
+    sections = [
+        (heading, str(text).strip())
+        for heading, text in pdf_content.items()
+        if text and str(text).strip()
+    ]
+    # Stable sort keeps original order within priority and non-priority groups
+    sections.sort(key=lambda section: not PRIORITY_SECTIONS.search(section[0]))
+    
+    full_length = sum(len(heading) + len(text) + 3 for heading, text in sections)
+    pdf_sections = "\n".join(
+        f"{heading}: {text[:MAX_SECTION_CHARS]}" for heading, text in sections
+    )[:MAX_PDF_CHARS]
+    
+    logger.debug(f"PDF content trimmed from {full_length} to {len(pdf_sections)} characters "
+                 f"(~{(full_length - len(pdf_sections)) // 4} tokens saved)")
+    
+    return pdf_sections or "No PDF content available"
+
+
+def read_streamed_analysis(response: requests.Response, full_reasoning: bool = True) -> Tuple[Dict[str, Any], bool]:
+    """
+    Read a streamed Ollama response and stop as soon as the answer is decoded.
+    
+    The stream is closed once the JSON object is complete, so trailing
+    whitespace the model emits after it isn't waited for. With
+    full_reasoning=False the stream is closed as soon as should_bid and
+    confidence are decoded, skipping the reasoning text. If the model hit
+    the token cap mid-object, should_bid and confidence are still recovered
+    when present and the result is marked incomplete.
+    
+    Args:
+        response: Streaming response from /api/generate
+        full_reasoning: Whether to wait for the full analysis including reasoning
+        
+    Returns:
+        Tuple of (analysis dict, True if the full JSON object was decoded)
+    """
+    buffer = ''
+    done_reason = None
     try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = orjson.loads(line)
+            text = chunk.get('response', '')
+            buffer += text
+            
+            if '}' in text:
+                try:
+                    return orjson.loads(buffer), True
+                except orjson.JSONDecodeError:
+                    pass
+            
+            if not full_reasoning:
+                should_bid = _SHOULD_BID_RE.search(buffer)
+                confidence = _CONFIDENCE_RE.search(buffer)
+                if should_bid and confidence:
+                    return {
+                        'should_bid': should_bid.group(1) == 'true',
+                        'confidence': confidence.group(1),
+                        'reasoning': '',
+                        'relevant_factors': []
+                    }, False
+            
+            if chunk.get('done'):
+                done_reason = chunk.get('done_reason')
+                break
+    finally:
+        response.close()
+    
+    # Cut off at num_predict - salvage the verdict rather than fail the tender
+    if done_reason == 'length':
+        should_bid = _SHOULD_BID_RE.search(buffer)
+        confidence = _CONFIDENCE_RE.search(buffer)
+        if should_bid and confidence:
+            logger.warning("Ollama response truncated at num_predict; reasoning dropped")
+            return {
+                'should_bid': should_bid.group(1) == 'true',
+                'confidence': confidence.group(1),
+                'reasoning': '',
+                'relevant_factors': []
+            }, False
+    
+    # Stream ended without a parseable object - strip markdown fences and retry
+    json_text = _JSON_FENCE_HEAD.sub('', buffer)
+    json_text = _JSON_FENCE_TAIL.sub('', json_text)
+    return orjson.loads(json_text.strip()), True
+
+
+def get_cache_key(tender: Dict[str, Any], cpv_codes: List[str], pdf_content: Dict[str, Any],
+                  model: str, strictness: str = 'lenient') -> str:
+    """
+    Build the analysis cache key for a tender.
+    
+    Args:
+        tender: Tender data
+        cpv_codes: List of CPV code strings
+        pdf_content: PDF content sections
+        model: Ollama model used for the analysis
+        strictness: Prompt variant used for the analysis
+        
+    Returns:
+        SHA256 hex digest of title, authority, CPV codes, PDF content, model and strictness
+    """
+    pdf_hash = hashlib.sha256(orjson.dumps(pdf_content, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+    key_data = [
+        tender.get('title', ''),
+        tender.get('contracting_authority', ''),
+        sorted(str(code) for code in cpv_codes),
+        pdf_hash,
+        model,
+        strictness
+    ]
+    return hashlib.sha256(orjson.dumps(key_data, default=str)).hexdigest()
+
+
+def analyze_tender_for_bid(combined_record: Dict[str, Any], model: str = OLLAMA_MODEL,
+                           strictness: Literal['strict', 'lenient'] = 'lenient',
+                           full_reasoning: bool = True) -> Dict[str, Any]:
+    """
+    Analyze a combined tender record to determine if IT consultancy should bid.
+    
+    Args:
+        combined_record: Combined record with tender, pdf, and cpv data
+        model: Ollama model to use
+        strictness: 'lenient' recommends any tender with a significant IT
+            component; 'strict' only recommends core IT work
+        full_reasoning: If False, stop generation once should_bid and confidence
+            are decoded (reasoning is left empty and estimated_fit is None)
+        
+    Returns:
+        Analysis result with bid recommendation and reasoning
+    """
+    record_get = combined_record.get
+    record_id = record_get('resource_id')
+    resource_id = record_get('resource_id', 'unknown')
+    
+    # Malformed records get the same per-tender error result as a failed LLM call
+    try:
+        # Build context for AI - bind the lookups once, sections may be missing or None
+        tender = record_get('tender') or {}
+        tender_get = tender.get
+        pdf_get = (record_get('pdf') or {}).get
+        cpv_get = (record_get('cpv') or {}).get
+        
+        # Parse CPV codes if they're strings (from CSV)
+        cpv_codes = cpv_get('cpv_codes', [])
+        if isinstance(cpv_codes, str):
+            cpv_codes = _CPV_RE.findall(cpv_codes)
+        
+        cpv_count = cpv_get('cpv_count', 0)
+        has_validated = cpv_get('has_validated_cpv', False)
+        if isinstance(has_validated, str):
+            has_validated = has_validated.lower() == 'true'
+        
+        logger.info(f"Analyzing tender {resource_id}: {cpv_count} CPV codes found, validated={has_validated}")
+        
+        # Skip the LLM for tenders the keyword pre-filter can decide
+        title = tender_get('title')
+        decision = prefilter_tender(str(title or ''), cpv_codes, has_validated)
+        if decision:
+            decision['resource_id'] = record_id
+            decision['analyzed_at'] = datetime.now().isoformat()
+            decision['llm_skipped'] = True
+            logger.info(f"Tender {resource_id} decided by pre-filter: should_bid={decision['should_bid']}, llm_skipped=True")
+            return decision
+        
+        # Extract PDF content sections for detailed analysis
+        pdf_content = pdf_get('pdf_content', {})
+        
+        # Handle both dict and JSON string formats
+        if isinstance(pdf_content, str):
+            try:
+                pdf_content = orjson.loads(pdf_content) if pdf_content else {}
+            except orjson.JSONDecodeError:
+                pdf_content = {}
+        
+        # Reuse earlier analysis of an identical tender
+        cache_key = get_cache_key(tender, cpv_codes, pdf_content, model, strictness)
+        with _CACHE_LOCK:
+            cached = _get_cache().get(cache_key)
+        if cached is not None:
+            logger.info(f"Tender {resource_id} analysis loaded from cache")
+            return {**cached, 'resource_id': record_id, 'analyzed_at': datetime.now().isoformat()}
+        
+        # Include PDF content within the prompt budget, most relevant sections first
+        pdf_sections = build_pdf_sections(pdf_content)
+        
+        user_prompt = USER_PROMPT_TEMPLATE.format(
+            title=tender_get('title', 'N/A'),
+            contracting_authority=tender_get('contracting_authority', 'N/A'),
+            estimated_value=tender_get('estimated_value', 'N/A'),
+            info=tender_get('info', 'N/A'),
+            main_classification=pdf_get('main_classification', 'N/A'),
+            cpv_count=cpv_count,
+            cpv_codes=cpv_codes,
+            has_validated=has_validated,
+            pdf_sections=pdf_sections
+        )
+        
         logger.debug(f"Sending bid analysis request to Ollama for tender {resource_id}")
-        response = requests.post(
-            'http://localhost:11434/api/generate',
+        response = _SESSION.post(
+            f'{OLLAMA_URL}/api/generate',
             json={
                 'model': model,
-                'prompt': context,
-                'stream': False,
-                'format': 'json'
+                'system': SYSTEM_PROMPTS[strictness],
+                'prompt': user_prompt,
+                'stream': True,
+                'format': 'json',
+                'keep_alive': OLLAMA_KEEP_ALIVE,
+                'options': {
+                    'num_predict': OLLAMA_NUM_PREDICT,
+                    'num_ctx': 8192,
+                    'temperature': 0
+                }
             },
-            timeout=30
+            timeout=(10, OLLAMA_READ_TIMEOUT),
+            stream=True
         )
         response.raise_for_status()
         
-        result = response.json()
-        response_text = result.get('response', '')
-        logger.debug(f"Received analysis response for tender {resource_id}")
-        
-        # Parse JSON response
-        import re
-        json_text = re.sub(r'^```json\s*\n', '', response_text)
-        json_text = re.sub(r'\n```\s*$', '', json_text)
-        json_text = json_text.strip()
-        
-        analysis = json.loads(json_text)
+        analysis, complete = read_streamed_analysis(response, full_reasoning)
+        logger.debug(f"Received analysis response for tender {resource_id} (complete={complete})")
         
         # Convert string values to numeric for database compatibility
         # confidence: "high" -> 0.90, "medium" -> 0.60, "low" -> 0.30
@@ -168,18 +496,28 @@ For non-IT tenders, set estimated_fit to 0-30.
             analysis['confidence'] = 0.30
         
         # estimated_fit: string number to float (0-100 scale, convert to 0-1 scale)
-        try:
-            fit_value = float(str(analysis.get('estimated_fit', '0')))
-            # If value is > 1, assume it's on 0-100 scale, convert to 0-1
-            if fit_value > 1:
-                fit_value = fit_value / 100.0
-            analysis['estimated_fit'] = min(max(fit_value, 0.0), 1.0)  # Clamp to 0-1
-        except (ValueError, TypeError):
-            analysis['estimated_fit'] = 0.0
+        # Not decoded when the stream was closed early
+        if not complete:
+            analysis['estimated_fit'] = None
+        else:
+            try:
+                fit_value = float(str(analysis.get('estimated_fit', '0')))
+                # If value is > 1, assume it's on 0-100 scale, convert to 0-1
+                if fit_value > 1:
+                    fit_value = fit_value / 100.0
+                analysis['estimated_fit'] = min(max(fit_value, 0.0), 1.0)  # Clamp to 0-1
+            except (ValueError, TypeError):
+                analysis['estimated_fit'] = 0.0
         
         # Add metadata
-        analysis['resource_id'] = combined_record.get('resource_id')
+        analysis['resource_id'] = record_id
         analysis['analyzed_at'] = datetime.now().isoformat()
+        analysis['llm_skipped'] = False
+        
+        # Only full analyses are cached so later full_reasoning calls get reasoning
+        if complete:
+            with _CACHE_LOCK:
+                _get_cache()[cache_key] = analysis
         
         should_bid = analysis.get('should_bid', False)
         confidence = analysis.get('confidence')
@@ -191,7 +529,7 @@ For non-IT tenders, set estimated_fit to 0-30.
         logger.error("Ollama connection failed - service not running")
         print("✗ Error: Ollama not running. Start it with: ollama serve")
         return {
-            'resource_id': combined_record.get('resource_id'),
+            'resource_id': record_id,
             'should_bid': False,
             'confidence': 0.30,
             'reasoning': 'Analysis failed - Ollama not running',
@@ -202,38 +540,65 @@ For non-IT tenders, set estimated_fit to 0-30.
         logger.error(f"Error analyzing tender {resource_id}: {e}", exc_info=True)
         print(f"Error analyzing tender {resource_id}: {e}")
         return {
-            'resource_id': combined_record.get('resource_id'),
+            'resource_id': record_id,
             'should_bid': False,
             'confidence': 0.30,
             'reasoning': f'Analysis failed: {str(e)}',
             'estimated_fit': 0.0,
             'error': True
         }
-        return {
-            'resource_id': resource_id,
-            'should_bid': False,
-            'confidence': 'low',
-            'reasoning': f'Analysis failed: {str(e)}',
-            'error': True
-        }
+
+
+def warm_up_model(model: str = OLLAMA_MODEL) -> bool:
+    """
+    Load the model into Ollama before a batch so the first requests don't pay
+    the cold-start cost. An empty prompt only loads the model.
+    
+    Args:
+        model: Ollama model to load
+        
+    Returns:
+        True if the model was loaded, False otherwise
+    """
+    try:
+        response = _SESSION.post(
+            f'{OLLAMA_URL}/api/generate',
+            json={'model': model, 'keep_alive': OLLAMA_KEEP_ALIVE},
+            timeout=300
+        )
+        response.raise_for_status()
+        logger.info(f"Model {model} loaded (keep_alive={OLLAMA_KEEP_ALIVE})")
+        return True
+    except requests.RequestException as e:
+        logger.warning(f"Model warmup failed for {model}: {e}")
+        return False
 
 
 def batch_analyze_tenders(combined_records: List[Dict[str, Any]], 
-                          model: str = "llama3.1:8b",
-                          output_file: str = None) -> None:
+                          model: str = OLLAMA_MODEL,
+                          output_file: str = None,
+                          max_workers: int = OLLAMA_CONCURRENCY,
+                          strictness: Literal['strict', 'lenient'] = 'lenient',
+                          full_reasoning: bool = True) -> None:
     """
     Analyze multiple tenders for bid recommendations.
     Streams results to file to avoid memory issues with large datasets.
     
+    Ollama requests are I/O-bound, so up to max_workers tenders are analyzed
+    concurrently. Results are written as each analysis completes, so output
+    order may differ from input order.
+    
+    JSON results are written as JSON Lines (one object per line); use
+    jsonl_to_json() to convert a run to a single JSON array.
+    
     Args:
         combined_records: List of combined tender records (can be generator)
         model: Ollama model to use
         output_file: Optional output file to stream results to
+        max_workers: Maximum number of concurrent Ollama requests (match OLLAMA_NUM_PARALLEL)
+        strictness: Prompt variant passed to analyze_tender_for_bid
+        full_reasoning: If False, skip generating reasoning text for faster analysis
     """
-    import os
-    from json_output import JSONOutput
-    from csv_output import CSVOutput
-    
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     # Create output directories
@@ -241,13 +606,14 @@ def batch_analyze_tenders(combined_records: List[Dict[str, Any]],
     os.makedirs('outputs/csv', exist_ok=True)
     
     # Initialize streaming outputs
-    json_output = JSONOutput(f'outputs/json/bid_analysis_{timestamp}.json', streaming=True)
+    jsonl_file = f'outputs/json/bid_analysis_{timestamp}.jsonl'
+    jsonl_handle = open(jsonl_file, 'wb')
     csv_output = CSVOutput(f'outputs/csv/bid_analysis_{timestamp}.csv', streaming=True)
     
     total = len(combined_records) if hasattr(combined_records, '__len__') else 0
     
-    logger.info("Starting batch bid analysis")
-    logger.info(f"Output files: outputs/json/bid_analysis_{timestamp}.json and CSV")
+    logger.info(f"Starting batch bid analysis with {max_workers} concurrent requests")
+    logger.info(f"Output files: {jsonl_file} and CSV")
     
     print(f"\nAnalyzing tenders for bid opportunities...")
     print("=" * 60)
@@ -255,47 +621,101 @@ def batch_analyze_tenders(combined_records: List[Dict[str, Any]],
     bid_count = 0
     processed = 0
     
-    try:
-        for idx, record in enumerate(combined_records, 1):
-            resource_id = record.get('resource_id', 'unknown')
-            print(f"[{idx}] Analyzing tender {resource_id}...", end=' ')
-            
-            analysis = analyze_tender_for_bid(record, model)
+    warm_up_model(model)
+    
+    # Results are written by a single writer thread so the submitting loop
+    # never waits on disk; None marks the end of the stream
+    write_queue = queue.Queue()
+    
+    def writer() -> None:
+        nonlocal bid_count, processed
+        while True:
+            analysis = write_queue.get()
+            if analysis is None:
+                break
             
             # Write immediately to both outputs
-            json_output.write_record(analysis)
+            jsonl_handle.write(orjson.dumps(analysis, default=str) + b'\n')
             csv_output.write_record(analysis)
             
             processed += 1
+            resource_id = analysis.get('resource_id', 'unknown')
             
             # Show result
             if analysis.get('should_bid'):
                 bid_count += 1
-                print(f"✓ BID ({analysis.get('confidence', 'unknown')} confidence)")
+                print(f"[{processed}] Tender {resource_id}: ✓ BID ({analysis.get('confidence', 'unknown')} confidence)")
             else:
-                print(f"✗ SKIP")
+                print(f"[{processed}] Tender {resource_id}: ✗ SKIP")
             
             # Periodic progress for large datasets
             if processed % 50 == 0:
                 print(f"  Progress: {processed} processed, {bid_count} bids recommended")
     
+    writer_thread = threading.Thread(target=writer, name='bid-analysis-writer', daemon=True)
+    writer_thread.start()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for record in combined_records:
+                pending.add(executor.submit(analyze_tender_for_bid, record, model, strictness, full_reasoning))
+                
+                # Bound in-flight requests so generators are not drained into memory
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write_queue.put(future.result())
+            
+            # Drain remaining requests
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_queue.put(future.result())
+    
     finally:
-        # Flush outputs
-        json_output.flush()
+        # Let the writer finish queued results, then flush outputs
+        write_queue.put(None)
+        writer_thread.join()
+        jsonl_handle.close()
+        print(f"✓ Wrote {processed} records to {jsonl_file}")
         csv_output.flush()
     
     logger.info("="*80)
     logger.info(f"Batch analysis complete: {bid_count}/{processed} tenders recommended for bidding")
-    logger.info(f"Results saved to outputs/json/bid_analysis_{timestamp}.json and CSV")
+    logger.info(f"Results saved to {jsonl_file} and CSV")
     logger.info("="*80)
     
     print("=" * 60)
     print(f"\nRecommendations: {bid_count}/{processed} tenders worth bidding on")
     print(f"Results saved to:")
-    print(f"  - outputs/json/bid_analysis_{timestamp}.json")
+    print(f"  - {jsonl_file}")
     print(f"  - outputs/csv/bid_analysis_{timestamp}.csv")
 
 
+def jsonl_to_json(jsonl_file: str, json_file: str = None) -> str:
+    """
+    Convert a JSON Lines bid analysis file to a single JSON array.
+    
+    Args:
+        jsonl_file: Path to the .jsonl file written by batch_analyze_tenders
+        json_file: Output path (defaults to jsonl_file with a .json extension)
+        
+    Returns:
+        Path of the written JSON file
+    """
+    json_file = json_file or os.path.splitext(jsonl_file)[0] + '.json'
+    
+    with open(jsonl_file, 'rb') as f:
+        records = [orjson.loads(line) for line in f if line.strip()]
+    
+    with open(json_file, 'wb') as f:
+        f.write(orjson.dumps(records, option=orjson.OPT_INDENT_2))
+    
+    print(f"✓ Converted {len(records)} records to {json_file}")
+    return json_file
+
+
 def save_bid_analysis(analyses: List[Dict[str, Any]], 
                       output_format: str = 'json',
                       output_file: str = None) -> None:
@@ -311,27 +731,21 @@ def save_bid_analysis(analyses: List[Dict[str, Any]],
     
     if output_format == 'json':
         output_file = output_file or f'bid_analysis_{timestamp}.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(analyses, f, indent=2)
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(analyses, option=orjson.OPT_INDENT_2, default=str))
         print(f"✓ Saved analysis to {output_file}")
         
     elif output_format == 'csv':
         output_file = output_file or f'bid_analysis_{timestamp}.csv'
         
-        import csv
         fieldnames = ['resource_id', 'should_bid', 'confidence', 'reasoning', 
                      'estimated_fit', 'analyzed_at']
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            
-            for analysis in analyses:
-                # Flatten relevant_factors if it exists
-                row = analysis.copy()
-                if 'relevant_factors' in row and isinstance(row['relevant_factors'], list):
-                    row['relevant_factors'] = ', '.join(row['relevant_factors'])
-                writer.writerow(row)
+        # Imported lazily so CLI startup doesn't pay for pandas
+        import pandas as pd
+        
+        df = pd.DataFrame.from_records(analyses, columns=fieldnames)
+        df.to_csv(output_file, index=False, encoding='utf-8')
         
         print(f"✓ Saved analysis to {output_file}")
 
@@ -352,10 +766,11 @@ if __name__ == "__main__":
             'csv',
             tenders_file=tender_files[0],
             pdfs_file=pdf_files[0] if pdf_files else 'pdfs.csv',
-            cpvs_file=cpv_files[0] if cpv_files else 'cpvs.csv'
+            cpvs_file=cpv_files[0] if cpv_files else 'cpvs.csv',
+            columns=ANALYSIS_COLUMNS
         )
         
         # Analyze all tenders (streaming output)
-        batch_analyze_tenders(combined)
+        batch_analyze_tenders(combined, strictness='lenient')
     else:
         print("No tender files found. Run the pipeline first.")
@@ -1,19 +1,37 @@
 import anthropic
 import os
 import json
+import mmap
 import re
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def parse_pdf_with_claude(text_content):
-    """Parse PDF text using Claude API"""
-    
-    client = anthropic.Anthropic(
-        api_key=os.environ.get("ANTHROPIC_API_KEY")
-    )
-    
-    prompt = """Extract the following fields from this tender PDF text and return ONLY valid JSON with no markdown formatting:
+# Header separator written by the PDF text extractor ahead of the body
+TEXT_MARKER = "EXTRACTED TEXT:\n" + "=" * 50 + "\n\n"
+# Files above this size are memory-mapped rather than read whole
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+CLAUDE_MODEL = "claude-haiku-4-5"
+# Seconds between status checks while a message batch is processing
+BATCH_POLL_INTERVAL = int(os.getenv('CLAUDE_BATCH_POLL_INTERVAL', '30'))
+
+# Shared client so every call reuses one HTTP connection pool
+_CLIENT = None
+
+def _get_client():
+    """Return the module-level Anthropic client, creating it on first use"""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = anthropic.Anthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY")
+        )
+    return _CLIENT
+
+def build_parse_prompt(text_content):
+    """Build the field-extraction prompt for one PDF's text"""
+    return """Extract the following fields from this tender PDF text and return ONLY valid JSON with no markdown formatting:
 {
   "procedure_id": "",
   "title": "",
@@ -31,12 +49,24 @@ For lots array, extract each lot with: lot_id, title, and estimated_value.
 
 PDF Text:
 """ + text_content
+
+def parse_claude_json(response_text):
+    """Strip any markdown code fences from a Claude reply and parse the JSON"""
+    json_text = re.sub(r'^```json\s*\n', '', response_text)
+    json_text = re.sub(r'\n```\s*$', '', json_text)
+    json_text = re.sub(r'^```\s*\n', '', json_text)
+    json_text = json_text.strip()
+    
+    return json.loads(json_text)
+
+def parse_pdf_with_claude(text_content):
+    """Parse PDF text using Claude API"""
     
-    message = client.messages.create(
-        model="claude-haiku-4-5",
+    message = _get_client().messages.create(
+        model=CLAUDE_MODEL,
         max_tokens=2048,
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": build_parse_prompt(text_content)}
         ]
     )
     
@@ -48,22 +78,87 @@ PDF Text:
     print(response_text)
     print("\n" + "="*50 + "\n")
     
-    # Remove markdown code blocks if present
-    json_text = re.sub(r'^```json\s*\n', '', response_text)
-    json_text = re.sub(r'\n```\s*$', '', json_text)
-    json_text = re.sub(r'^```\s*\n', '', json_text)
-    json_text = json_text.strip()
+    return parse_claude_json(response_text)
+
+def parse_pdfs_batch(filepaths):
+    """Parse many extracted PDF text files through the Message Batches API.
     
-    return json.loads(json_text)
+    Batches are billed at roughly half the per-token price and run
+    asynchronously on Anthropic's side, so this is the path for offline
+    bulk runs; use parse_pdf_file for interactive, one-off parsing.
+    
+    Args:
+        filepaths: Paths to text files produced by the PDF extractor
+        
+    Returns:
+        Dict mapping each filepath to its parsed fields, or to
+        {'error': ...} if that request failed or returned invalid JSON
+    """
+    client = _get_client()
+    
+    # custom_id only allows [a-zA-Z0-9_-], so key requests by position
+    ids = {f"pdf-{i}": path for i, path in enumerate(filepaths)}
+    requests = [
+        {
+            "custom_id": custom_id,
+            "params": {
+                "model": CLAUDE_MODEL,
+                "max_tokens": 2048,
+                "messages": [
+                    {"role": "user",
+                     "content": build_parse_prompt(read_extracted_text(path))}
+                ],
+            },
+        }
+        for custom_id, path in ids.items()
+    ]
+    
+    batch = client.messages.batches.create(requests=requests)
+    print(f"✓ Submitted batch {batch.id} with {len(requests)} PDFs")
+    
+    while batch.processing_status != "ended":
+        time.sleep(BATCH_POLL_INTERVAL)
+        batch = client.messages.batches.retrieve(batch.id)
+    
+    results = {}
+    for entry in client.messages.batches.results(batch.id):
+        path = ids[entry.custom_id]
+        if entry.result.type != "succeeded":
+            results[path] = {"error": entry.result.type}
+            continue
+        try:
+            results[path] = parse_claude_json(entry.result.message.content[0].text)
+        except json.JSONDecodeError as e:
+            results[path] = {"error": f"invalid JSON: {e}"}
+    
+    succeeded = sum(1 for r in results.values() if "error" not in r)
+    print(f"✓ Batch {batch.id} finished: {succeeded}/{len(requests)} parsed")
+    return results
+
+def read_extracted_text(filepath):
+    """Return the body of an extracted PDF text file, minus our header.
+    
+    Args:
+        filepath: Path to a text file produced by the PDF extractor
+        
+    Returns:
+        Text following the header marker, or the whole file if no marker
+    """
+    if os.path.getsize(filepath) > MMAP_THRESHOLD_BYTES:
+        with open(filepath, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            marker = TEXT_MARKER.encode('utf-8')
+            start = mm.find(marker)
+            start = 0 if start == -1 else start + len(marker)
+            return mm[start:].decode('utf-8')
+    
+    with open(filepath, 'r', encoding='utf-8') as f:
+        head, sep, body = f.read().partition(TEXT_MARKER)
+    return body if sep else head
 
 def parse_pdf_file(filepath):
     """Read PDF text file and parse with Claude"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-        # Remove the header info we added
-        text_content = content.split("EXTRACTED TEXT:\n==================================================\n\n", 1)[1]
-    
-    return parse_pdf_with_claude(text_content)
+    return parse_pdf_with_claude(read_extracted_text(filepath))
 
 if __name__ == "__main__":
     # Parse the extracted PDF text
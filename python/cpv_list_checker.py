@@ -6,16 +6,127 @@ Uses cpv_list.json to validate codes against known IT/software CPV codes
 import logging
 import json
 import re
-from typing import Dict, Any, List
+import orjson
+from bisect import bisect_right
+from typing import Dict, Any, Iterator, List, Tuple
+
+try:
+    import re2  # linear-time matching on long PDF text
+except ImportError:  # optional - falls back to the stdlib engine
+    re2 = re
+
+try:
+    import ahocorasick
+except ImportError:  # optional - falls back to DIGIT_RUN_RE scanning
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
 
 # Load CPV list once at module level
-with open('cpv_list.json', 'r', encoding='utf-8') as f:
-    CPV_LIST = json.load(f)
+with open('cpv_list.json', 'rb') as f:
+    CPV_LIST = orjson.loads(f.read())
     CPV_CODES = {item['code']: item['description'] for item in CPV_LIST}
 
+# Known codes for membership tests; CPV_CODES is kept for description lookups
+CPV_KEY_SET = frozenset(CPV_CODES)
+
+# Runs of 8+ ASCII digits; the standalone 8-digit ones are candidate CPV codes.
+# Boundaries are checked with _is_word_char instead of \b, since re2's \b is
+# ASCII-only and the stdlib's is Unicode-aware
+DIGIT_RUN_RE = re2.compile(r'[0-9]{8,}')
+# Joins PDF sections for a single scan (ASCII unit separator)
+SECTION_SEPARATOR = '\x1f'
+
+# Automaton over the known codes, so long texts are matched against the CPV
+# list in one pass instead of regex-scanning every 8-digit number
+if ahocorasick is not None:
+    CPV_AUTOMATON = ahocorasick.Automaton()
+    for _code in CPV_CODES:
+        CPV_AUTOMATON.add_word(_code, _code)
+    CPV_AUTOMATON.make_automaton()
+else:
+    CPV_AUTOMATON = None
+
+
+def _is_word_char(ch: str) -> bool:
+    """Match the regex notion of a word character for boundary checks."""
+    return ch.isalnum() or ch == '_'
+
+
+def _iter_standalone_codes(text: str) -> Iterator[Tuple[int, str]]:
+    """
+    Find 8-digit numbers not inside a longer number or word.
+    
+    Args:
+        text: Text to search
+        
+    Yields:
+        (start offset, code) for each standalone 8-digit number
+    """
+    length = len(text)
+    for match in DIGIT_RUN_RE.finditer(text):
+        start, end = match.span()
+        if end - start != 8:
+            continue
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end < length and _is_word_char(text[end]):
+            continue
+        yield start, match.group()
+
+
+def _may_contain_code(text: str) -> bool:
+    """Cheap pre-check before scanning: at least 8 characters and some digit."""
+    return len(text) >= 8 and any(digit in text for digit in '0123456789')
+
+
+def find_known_cpv_codes(text: str) -> List[str]:
+    """
+    Find codes from the CPV list that appear as standalone 8-digit numbers.
+    
+    Args:
+        text: Text to search
+        
+    Returns:
+        Known CPV codes in order of appearance (may contain repeats)
+    """
+    # Most title/info text has no numbers at all
+    if not _may_contain_code(text):
+        return []
+    
+    if CPV_AUTOMATON is None:
+        return [code for _, code in _iter_standalone_codes(text) if code in CPV_KEY_SET]
+    
+    codes = []
+    last = len(text) - 1
+    for end, code in CPV_AUTOMATON.iter(text):
+        start = end - 7
+        # Same boundaries as _iter_standalone_codes - skip codes inside longer numbers/words
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end < last and _is_word_char(text[end + 1]):
+            continue
+        codes.append(code)
+    return codes
+
+
+def _as_text(value: Any) -> str:
+    """str() for non-string field values; strings pass through, None becomes ''."""
+    if type(value) is str:
+        return value
+    return '' if value is None else str(value)
+
+
+def _searchable_text(record: Dict[str, Any]) -> str:
+    """Join the free-text fields searched for CPV codes."""
+    get = record.get
+    return ' '.join((
+        _as_text(get('title')),
+        _as_text(get('info')),
+        _as_text(get('contracting_authority'))
+    ))
+
 
 def extract_cpv_codes(record: Dict[str, Any]) -> List[Dict[str, str]]:
     """
@@ -27,7 +138,22 @@ def extract_cpv_codes(record: Dict[str, Any]) -> List[Dict[str, str]]:
     Returns:
         List of CPV code dictionaries with code, description, and source
     """
+    return _extract_cpv_codes(record)[0]
+
+
+def _extract_cpv_codes(record: Dict[str, Any]) -> Tuple[List[Dict[str, str]], bool]:
+    """
+    Extract CPV codes, noting whether any is validated while building the list.
+    
+    Args:
+        record: Tender record with potential CPV codes
+        
+    Returns:
+        Tuple of (CPV code dictionaries, whether any code is validated)
+    """
     found_cpvs = []
+    seen = set()
+    has_validated = False
     resource_id = record.get('resource_id', 'unknown')
     logger.debug(f"Extracting CPV codes for tender {resource_id}")
     
@@ -38,64 +164,77 @@ def extract_cpv_codes(record: Dict[str, Any]) -> List[Dict[str, str]]:
         main_class = pdf_data.get('main_classification', '')
         if main_class:
             # Extract ALL CPV codes from main_classification (not just first)
-            matches = re.findall(r'\b(\d{8})\b', main_class)
-            for code in matches:
-                if not any(cpv['code'] == code for cpv in found_cpvs):
+            for _, code in _iter_standalone_codes(main_class):
+                if code not in seen:
+                    validated = code in CPV_KEY_SET
                     found_cpvs.append({
                         'code': code,
                         'description': main_class,
                         'source': 'pdf_main_classification',
-                        'validated': code in CPV_CODES
+                        'validated': validated
                     })
+                    seen.add(code)
+                    has_validated = has_validated or validated
         
         # Also check pdf_content (organized sections) if it exists
         pdf_content = pdf_data.get('pdf_content', {})
         if isinstance(pdf_content, dict):
+            # Scan all sections in one regex pass; the separator is a non-word
+            # character so codes can't span sections, and each match is mapped
+            # back to its section by end offset
+            section_ends = []
+            section_names = []
+            parts = []
+            end = 0
             for section_name, section_text in pdf_content.items():
                 if isinstance(section_text, str):
-                    matches = re.findall(r'\b(\d{8})\b', section_text)
-                    for code in matches:
-                        if code in CPV_CODES and not any(cpv['code'] == code for cpv in found_cpvs):
-                            found_cpvs.append({
-                                'code': code,
-                                'description': CPV_CODES[code],
-                                'source': f'pdf_content_{section_name}',
-                                'validated': True
-                            })
-                            logger.debug(f"Found CPV code {code} in PDF section '{section_name}' for tender {resource_id}")
+                    parts.append(section_text)
+                    end += len(section_text) + 1
+                    section_ends.append(end)
+                    section_names.append(section_name)
+            
+            for start, code in _iter_standalone_codes(SECTION_SEPARATOR.join(parts)):
+                if code in CPV_KEY_SET and code not in seen:
+                    section_name = section_names[bisect_right(section_ends, start)]
+                    found_cpvs.append({
+                        'code': code,
+                        'description': CPV_CODES[code],
+                        'source': f'pdf_content_{section_name}',
+                        'validated': True
+                    })
+                    seen.add(code)
+                    has_validated = True
+                    logger.debug(f"Found CPV code {code} in PDF section '{section_name}' for tender {resource_id}")
         
         # Check pdf_content_full_text if it exists (fallback when parsing fails)
         full_text = pdf_data.get('pdf_content_full_text', '')
         if full_text:
-            matches = re.findall(r'\b(\d{8})\b', full_text)
-            for code in matches:
-                if code in CPV_CODES and not any(cpv['code'] == code for cpv in found_cpvs):
+            for code in find_known_cpv_codes(full_text):
+                if code not in seen:
                     found_cpvs.append({
                         'code': code,
                         'description': CPV_CODES[code],
                         'source': 'pdf_full_text',
                         'validated': True
                     })
+                    seen.add(code)
+                    has_validated = True
                     logger.debug(f"Found CPV code {code} in PDF full text for tender {resource_id}")
     
     # Search in title and info fields for CPV patterns
-    searchable_text = ' '.join([
-        str(record.get('title', '')),
-        str(record.get('info', '')),
-        str(record.get('contracting_authority', ''))
-    ])
-    
-    # Find all 8-digit numbers that might be CPV codes
-    potential_codes = re.findall(r'\b(\d{8})\b', searchable_text)
+    # Find known CPV codes among the 8-digit numbers
+    potential_codes = find_known_cpv_codes(_searchable_text(record))
     
     for code in potential_codes:
-        if code in CPV_CODES and not any(cpv['code'] == code for cpv in found_cpvs):
+        if code not in seen:
             found_cpvs.append({
                 'code': code,
                 'description': CPV_CODES[code],
                 'source': 'text_search',
                 'validated': True
             })
+            seen.add(code)
+            has_validated = True
             logger.debug(f"Found validated CPV code {code} for tender {resource_id}")
     
     if found_cpvs:
@@ -103,26 +242,28 @@ def extract_cpv_codes(record: Dict[str, Any]) -> List[Dict[str, str]]:
     else:
         logger.debug(f"No CPV codes found for tender {resource_id}")
     
-    return found_cpvs
+    return found_cpvs, has_validated
 
 
-def check_cpv_codes(record: Dict[str, Any]) -> Dict[str, Any]:
+def check_cpv_codes(record: Dict[str, Any], in_place: bool = False) -> Dict[str, Any]:
     """
     Check and enrich record with CPV code information.
     
     Args:
         record: Tender record dictionary
+        in_place: If True, add the CPV fields to record itself instead of a copy
+            (for callers that own the record and don't need the original)
         
     Returns:
         Record enriched with cpv_codes field
     """
-    enriched = record.copy()
+    enriched = record if in_place else record.copy()
     
-    cpv_codes = extract_cpv_codes(record)
+    cpv_codes, has_validated = _extract_cpv_codes(record)
     
     enriched['cpv_codes'] = cpv_codes
     enriched['cpv_count'] = len(cpv_codes)
-    enriched['has_validated_cpv'] = any(cpv['validated'] for cpv in cpv_codes)
+    enriched['has_validated_cpv'] = has_validated
     
     # Create simple list of just the codes
     enriched['cpv_code_list'] = [cpv['code'] for cpv in cpv_codes]
@@ -109,7 +109,9 @@ CREATE INDEX idx_etenders_core_published ON etenders_core(date_published_parsed
 CREATE INDEX idx_etenders_core_deadline ON etenders_core(submission_deadline_parsed);
 CREATE INDEX idx_etenders_core_status ON etenders_core(status);
 CREATE INDEX idx_etenders_core_value ON etenders_core(estimated_value_numeric);
-CREATE INDEX idx_cpv_checker_validated ON cpv_checker(has_validated_cpv);
+-- Partial indexes back the dashboard's parsed/validated counts
+CREATE INDEX idx_etenders_pdf_parsed ON etenders_pdf(pdf_parsed) WHERE pdf_parsed;
+CREATE INDEX idx_cpv_checker_validated ON cpv_checker(has_validated_cpv) WHERE has_validated_cpv;
 CREATE INDEX idx_sales_updates_resource ON sales_updates(resource_id);
 CREATE INDEX idx_sales_updates_date ON sales_updates(update_date DESC);
 
@@ -3,9 +3,28 @@ CSV output handler with error logging
 """
 
 import csv
-from typing import Dict, Any, List
+import io
+import json
+import orjson
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
 from datetime import datetime
 
+# Large write buffer so big exports aren't bound by write() syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+# Streamed rows are handed to csv.writer.writerows in batches of this size
+ROW_BATCH_SIZE = 4096
+
+
+def _list_to_csv(value: list) -> str:
+    """Serialize a list as a JSON string for a CSV cell; empty lists become ''."""
+    if not value:
+        return ''
+    try:
+        return orjson.dumps(value, default=str).decode('utf-8')
+    except TypeError:
+        # e.g. dicts with non-string keys
+        return json.dumps(value, default=str)
+
 
 class CSVOutput:
     def __init__(self, output_file: str = 'output.csv', log_file: str = 'csv_output_errors.log', streaming: bool = True):
@@ -15,7 +34,8 @@ class CSVOutput:
         Args:
             output_file: Path to output CSV file
             log_file: Path to error log file
-            streaming: If True, write records immediately; if False, buffer in memory
+            streaming: If True, stream rows to the file in batches of ROW_BATCH_SIZE;
+                if False, buffer all records in memory
         """
         self.output_file = output_file
         self.log_file = log_file
@@ -26,10 +46,16 @@ class CSVOutput:
         self.fieldnames = None
         self.file_handle = None
         self.csv_writer = None
+        self.header = None
+        self.row_buffer = []
+        self.log_handle = None
+        # Key paths learned from the first record, reused while the shape holds
+        self._flatten_plan = None
         
         if streaming:
             # Open file for streaming writes
-            self.file_handle = open(output_file, 'w', newline='', encoding='utf-8')
+            self.file_handle = open(output_file, 'w', newline='', encoding='utf-8',
+                                    buffering=WRITE_BUFFER_SIZE)
         
     def write_record(self, record: Dict[str, Any]) -> bool:
         """
@@ -43,33 +69,35 @@ class CSVOutput:
         """
         try:
             # Flatten nested structures for CSV
-            flat_record = self._flatten_record(record)
+            flat_record = self._flatten_cached(record)
             
             # Update fieldnames
             if self.fieldnames is None:
                 self.fieldnames = list(flat_record.keys())
                 if self.streaming:
-                    # Write header on first record
-                    self.csv_writer = csv.DictWriter(self.file_handle, fieldnames=self.fieldnames, extrasaction='ignore')
-                    self.csv_writer.writeheader()
+                    # Write header on first record; streamed rows follow its column order
+                    self.header = list(self.fieldnames)
+                    self.csv_writer = csv.writer(self.file_handle)
+                    self.csv_writer.writerow(self.header)
             else:
                 # Add any new fields
                 new_fields = [key for key in flat_record.keys() if key not in self.fieldnames]
                 if new_fields:
                     self.fieldnames.extend(new_fields)
                     if self.streaming:
-                        # Can't add fields mid-stream in CSV, log warning
+                        # Can't add fields mid-stream in CSV, so they are dropped
                         print(f"⚠ Warning: New fields found mid-stream: {new_fields}")
             
             if self.streaming:
-                # Write directly to file
-                row = {field: flat_record.get(field, '') for field in self.fieldnames}
-                self.csv_writer.writerow(row)
-                self.file_handle.flush()  # Flush after each write to ensure data is written
+                # Queue the row; full batches go to the file
+                self.row_buffer.append([flat_record.get(field, '') for field in self.header])
+                if len(self.row_buffer) >= ROW_BATCH_SIZE:
+                    self._write_buffered_rows()
                 self.records_written += 1
             else:
                 # Buffer in memory
-                self.records.append(flat_record)
+                # Don't hold on to the caller's dict when it was already flat
+                self.records.append(dict(flat_record) if flat_record is record else flat_record)
                 self.records_written += 1
             
             return True
@@ -81,33 +109,70 @@ class CSVOutput:
     
     def flush(self) -> None:
         """Write all buffered records to CSV file or close streaming file."""
-        if self.streaming:
-            # Just close the file handle
-            if self.file_handle:
-                self.file_handle.close()
-                self.file_handle = None
-            print(f"✓ Wrote {self.records_written} records to {self.output_file}")
-        else:
-            # Write all buffered records
-            if not self.records:
-                print("⚠ No records to write to CSV")
-                return
-                
-            try:
-                with open(self.output_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
-                    writer.writeheader()
+        try:
+            if self.streaming:
+                if self.file_handle:
+                    try:
+                        self._write_buffered_rows()
+                    except Exception as e:
+                        print(f"✗ Error writing CSV file: {e}")
+                        self._log_error({'action': 'flush'}, str(e))
+                    finally:
+                        # Closing flushes the write buffer
+                        self.file_handle.close()
+                        self.file_handle = None
+                print(f"✓ Wrote {self.records_written} records to {self.output_file}")
+            else:
+                # Write all buffered records
+                if not self.records:
+                    print("⚠ No records to write to CSV")
+                    return
                     
-                    for record in self.records:
+                try:
+                    with open(self.output_file, 'w', newline='', encoding='utf-8',
+                              buffering=WRITE_BUFFER_SIZE) as f:
+                        writer = csv.writer(f)
+                        writer.writerow(self.fieldnames)
                         # Ensure all fields exist
-                        row = {field: record.get(field, '') for field in self.fieldnames}
-                        writer.writerow(row)
-                
-                print(f"✓ Wrote {len(self.records)} records to {self.output_file}")
-                
-            except Exception as e:
-                print(f"✗ Error writing CSV file: {e}")
-                self._log_error({'action': 'flush'}, str(e))
+                        writer.writerows([[record.get(field, '') for field in self.fieldnames]
+                                          for record in self.records])
+                    
+                    print(f"✓ Wrote {len(self.records)} records to {self.output_file}")
+                    
+                except Exception as e:
+                    print(f"✗ Error writing CSV file: {e}")
+                    self._log_error({'action': 'flush'}, str(e))
+        finally:
+            self._close_log()
+    
+    def _write_buffered_rows(self) -> None:
+        """
+        Write pending streamed rows to the file in one write call.
+        
+        The batch is serialized in memory first, so a row that fails to
+        serialize never leaves part of the batch in the file. If that
+        happens the batch is redone row by row and failing rows are logged
+        and skipped. The buffer is cleared up front so no row is written twice.
+        """
+        rows, self.row_buffer = self.row_buffer, []
+        if not rows:
+            return
+        
+        batch = io.StringIO()
+        writer = csv.writer(batch)
+        try:
+            writer.writerows(rows)
+        except Exception:
+            batch.seek(0)
+            batch.truncate()
+            for row in rows:
+                try:
+                    writer.writerow(row)
+                except Exception as e:
+                    self.error_count += 1
+                    self.records_written -= 1
+                    self._log_error(dict(zip(self.header, row)), str(e))
+        self.file_handle.write(batch.getvalue())
     
     def _flatten_record(self, record: Dict[str, Any], parent_key: str = '', sep: str = '_') -> Dict[str, Any]:
         """
@@ -129,21 +194,102 @@ class CSVOutput:
                 items.extend(self._flatten_record(v, new_key, sep=sep).items())
             elif isinstance(v, list):
                 # Convert lists to JSON strings for CSV
-                items.append((new_key, str(v)))
+                items.append((new_key, _list_to_csv(v)))
             else:
                 items.append((new_key, v))
         
         return dict(items)
     
+    def _flatten_cached(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Flatten a record with the cached plan, rebuilding the plan if the
+        record's shape differs from the one it was built from.
+        
+        Args:
+            record: Dictionary to flatten
+            
+        Returns:
+            Flattened dictionary, identical to _flatten_record(record)
+            (the record itself if it is already flat)
+        """
+        # Already-flat records need no path walking; lists only need serializing
+        if not any(isinstance(v, dict) for v in record.values()):
+            if not any(isinstance(v, list) for v in record.values()):
+                return record
+            return {k: _list_to_csv(v) if isinstance(v, list) else v for k, v in record.items()}
+        
+        if self._flatten_plan is not None:
+            flat = self._apply_flatten_plan(record)
+            if flat is not None:
+                return flat
+        
+        checks, leaves = [], []
+        self._build_flatten_plan(record, (), '', checks, leaves)
+        self._flatten_plan = (checks, leaves)
+        return self._flatten_record(record)
+    
+    def _build_flatten_plan(self, record: Dict[str, Any], path: Tuple[str, ...], parent_key: str,
+                            checks: List[Tuple[Tuple[str, ...], FrozenSet[str]]],
+                            leaves: List[Tuple[str, Tuple[str, ...]]], sep: str = '_') -> None:
+        """Record the key set of every nested dict and the path to every leaf."""
+        checks.append((path, frozenset(record)))
+        for k, v in record.items():
+            new_key = f"{parent_key}{sep}{k}" if parent_key else k
+            if isinstance(v, dict):
+                self._build_flatten_plan(v, path + (k,), new_key, checks, leaves, sep)
+            else:
+                leaves.append((new_key, path + (k,)))
+    
+    def _apply_flatten_plan(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Flatten along the cached key paths; None if the shape has changed."""
+        checks, leaves = self._flatten_plan
+        
+        # Parents are checked before children, so every lookup below is safe
+        for path, keys in checks:
+            node = record
+            for k in path:
+                node = node[k]
+            if not isinstance(node, dict) or node.keys() != keys:
+                return None
+        
+        flat = {}
+        for out_key, path in leaves:
+            v = record
+            for k in path:
+                v = v[k]
+            if isinstance(v, dict):
+                return None
+            # Convert lists to JSON strings for CSV
+            flat[out_key] = _list_to_csv(v) if isinstance(v, list) else v
+        return flat
+    
     def _log_error(self, record: Dict[str, Any], error: str) -> None:
-        """Log errors to file."""
+        """Log errors to file, keeping the log open across errors."""
+        if self.log_handle is None:
+            self.log_handle = open(self.log_file, 'a', encoding='utf-8', buffering=1 << 16)
+        
+        try:
+            record_str = json.dumps(record, default=str)
+        except (TypeError, ValueError):
+            record_str = str(record)
+        
         timestamp = datetime.now().isoformat()
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] CSV Write Error\n")
-            f.write(f"Error: {error}\n")
-            f.write(f"Record ID: {record.get('resource_id', 'unknown')}\n")
-            f.write(f"Record: {str(record)[:500]}...\n")
-            f.write("-" * 80 + "\n")
+        self.log_handle.write(
+            f"[{timestamp}] CSV Write Error\n"
+            f"Error: {error}\n"
+            f"Record ID: {record.get('resource_id', 'unknown')}\n"
+            f"Record: {record_str[:500]}...\n"
+            + "-" * 80 + "\n"
+        )
+    
+    def _close_log(self) -> None:
+        """Close the error log if any errors were written."""
+        if self.log_handle is not None:
+            self.log_handle.close()
+            self.log_handle = None
+    
+    def __del__(self):
+        self._close_log()
     
     def get_stats(self) -> Dict[str, int]:
         """Get output statistics."""
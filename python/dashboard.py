@@ -7,10 +7,16 @@ from sqlalchemy import create_engine
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 
+try:
+    import connectorx as cx  # binary-protocol reads straight into pandas
+except ImportError:  # optional - falls back to pd.read_sql over SQLAlchemy
+    cx = None
+
 load_dotenv()
 
 # Page config
@@ -21,61 +27,247 @@ st.set_page_config(
 )
 
 # Database connection
+DB_URL = f"postgresql://{os.getenv('DB_USER', 'etenders_user')}:{os.getenv('DB_PASSWORD', 'etenders_pass')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'etenders_db')}"
+
 @st.cache_resource
 def get_engine():
     """Create SQLAlchemy engine"""
-    db_url = f"postgresql://{os.getenv('DB_USER', 'etenders_user')}:{os.getenv('DB_PASSWORD', 'etenders_pass')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'etenders_db')}"
-    return create_engine(db_url)
+    return create_engine(DB_URL)
+
+def read_sql(query, conn=None, params=None):
+    """Run a read query into a DataFrame
+    
+    Uses connectorx's binary protocol when installed, which skips building
+    a Python object per value and opens its own connection from DB_URL (conn
+    is unused); otherwise pd.read_sql on conn or the engine. connectorx has
+    no bound parameters, so queries with params always use pd.read_sql.
+    """
+    if cx is not None and not params:
+        return cx.read_sql(DB_URL, query, return_type="pandas", protocol="binary")
+    return pd.read_sql(query, conn if conn is not None else get_engine(), params=params)
 
 @st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_data(query):
-    """Execute query and return dataframe"""
-    engine = get_engine()
-    df = pd.read_sql(query, engine)
+def load_data(query, _conn=None):
+    """Execute query and return dataframe
+    
+    _conn is an open connection to reuse; the leading underscore keeps it
+    out of Streamlit's cache key.
+    """
+    df = read_sql(query, _conn)
+    return df
+
+def format_column(series, fmt, missing="N/A"):
+    """Format a numeric column with a bound str.format, filling missing values
+    
+    Args:
+        series: Numeric pandas Series
+        fmt: Format string with a single replacement field
+        missing: Text shown for missing values
+        
+    Returns:
+        Series of display strings
+    """
+    return series.dropna().map(fmt.format).reindex(series.index, fill_value=missing)
+
+@st.cache_data(max_entries=4)
+def format_tender_table(df):
+    """Format a top-tenders query result for display (pure, so cached per result)
+    
+    Keyed on the frame's content, so entries never go stale and need no TTL;
+    max_entries keeps just the current valued/unknown pair plus one refresh.
+    """
+    display_df = df.copy()
+    if 'value' in display_df:
+        display_df['value'] = format_column(display_df['value'], '€{:,.0f}')
+    display_df['confidence'] = format_column(display_df['confidence'], '{:.0%}')
+    display_df['deadline'] = pd.to_datetime(display_df['deadline']).dt.strftime('%Y-%m-%d')
+    
+    # Rename columns for display
+    return display_df.rename(columns={
+        'resource_id': 'ID',
+        'title': 'Title',
+        'contracting_authority': 'Authority',
+        'value': 'Value',
+        'deadline': 'Deadline',
+        'confidence': 'Confidence',
+        'reasoning': 'AI Reasoning'
+    })
+
+def data_version(_conn=None):
+    """Cheap change sentinel for the tables behind load_core
+    
+    Row counts catch deletes; max(updated_at) catches inserts and updates.
+    Runs uncached on every render.
+    """
+    query = """
+        SELECT
+            (SELECT max(updated_at) FROM etenders_core) as core_updated,
+            (SELECT count(*) FROM etenders_core) as core_count,
+            (SELECT max(updated_at) FROM bid_analysis) as analysis_updated,
+            (SELECT count(*) FROM bid_analysis) as analysis_count
+    """
+    row = read_sql(query, _conn).iloc[0]
+    return tuple(str(v) for v in row)
+
+# Every tender joined with its bid analysis; updated_at is the row's
+# watermark for delta loads (GREATEST skips a missing analysis)
+CORE_QUERY = """
+    SELECT 
+        ec.resource_id,
+        ec.title,
+        ec.contracting_authority,
+        ec.estimated_value_numeric::float8 as value,
+        ec.submission_deadline_parsed as deadline,
+        ba.resource_id IS NOT NULL as analyzed,
+        ba.should_bid,
+        ba.confidence::real as confidence,
+        ba.reasoning,
+        GREATEST(ec.updated_at, ba.updated_at) as updated_at
+    FROM etenders_core ec
+    LEFT JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
+"""
+
+def read_core(where="", _conn=None, params=None):
+    """Run CORE_QUERY with an optional WHERE clause (bound params) and fix column dtypes"""
+    df = read_sql(CORE_QUERY + where, _conn, params)
+    return df.astype({'value': 'float64', 'confidence': 'float32'})
+
+@st.cache_data(max_entries=2)
+def load_core(version, _conn=None):
+    """Load every tender joined with its bid analysis in one query
+    
+    All metrics and charts are aggregated from this frame in pandas rather
+    than with a query each. Cached on the data_version() sentinel, so the
+    query re-runs only when the underlying tables change.
+    """
+    return read_core(_conn=_conn)
+
+# Delta loads re-read this far behind the watermark: updated_at defaults to the
+# writer's transaction start, so a row committed after the last load can be
+# stamped earlier than the watermark. Updates older than this are still missed
+# until the next full load (deletes and inserts are caught by the counts).
+DELTA_OVERLAP = timedelta(minutes=5)
+
+def load_core_incremental(_conn=None):
+    """Return the core frame, fetching only changed rows when possible
+    
+    The session keeps its last frame and sentinel. When the sentinel moves,
+    rows updated since the frame's newest updated_at (less DELTA_OVERLAP) are
+    fetched and merged by resource_id. Deletes leave the merged counts short of the sentinel's,
+    which falls back to a full load_core().
+    """
+    version = data_version(_conn)
+    state = st.session_state
+    if state.get('core_version') == version:
+        return state['core_df']
+    
+    df = state.get('core_df')
+    since = df['updated_at'].max() if df is not None else pd.NaT
+    if pd.notna(since):
+        delta = read_core("""
+            WHERE ec.updated_at >= %(since)s
+               OR ba.updated_at >= %(since)s
+        """, _conn, params={'since': (since - DELTA_OVERLAP).to_pydatetime()})
+        df = pd.concat([df, delta], ignore_index=True).drop_duplicates('resource_id', keep='last')
+        core_count, analysis_count = int(version[1]), int(version[3])
+        if len(df) != core_count or int(df['analyzed'].sum()) != analysis_count:
+            df = None
+    else:
+        df = None
+    
+    if df is None:
+        df = load_core(version, _conn=_conn)
+    
+    state['core_version'] = version
+    state['core_df'] = df
     return df
 
+# Value range buckets shared by the main chart and the sidebar
+VALUE_EDGES = np.array([50000, 100000, 250000, 500000], dtype=np.float64)
+VALUE_LABELS = ['< €50k', '€50k - €100k', '€100k - €250k', '€250k - €500k', '> €500k']
+
+def bucket_values(values):
+    """Count and total values per VALUE_LABELS range (lower bound inclusive)
+    
+    One vectorized pass: searchsorted assigns buckets, bincount tallies them.
+    Only non-empty ranges are returned, in range order.
+    """
+    vals = np.asarray(values, dtype=np.float64)
+    vals = vals[~np.isnan(vals)]
+    idx = np.searchsorted(VALUE_EDGES, vals, side='right')
+    buckets = pd.DataFrame({
+        'value_range': VALUE_LABELS,
+        'tender_count': np.bincount(idx, minlength=len(VALUE_LABELS)),
+        'total_value': np.bincount(idx, weights=vals, minlength=len(VALUE_LABELS))
+    })
+    return buckets[buckets['tender_count'] > 0].reset_index(drop=True)
+
+# Scatter plots are capped at this many points; larger sets are sampled
+SCATTER_MAX_POINTS = 4000
+
+def sample_scatter(df, y, by, max_points=SCATTER_MAX_POINTS):
+    """Randomly sample a scatter down to about max_points rows, stratified by `by`
+    
+    Each group keeps its share of points (at least one), so sparse groups
+    don't vanish. A fixed seed keeps the plot stable across reruns.
+    """
+    df = df[df[y].notna()]
+    if len(df) <= max_points:
+        return df
+    
+    shuffled = df.sample(frac=1, random_state=0)
+    groups = shuffled.groupby(by, dropna=False)
+    quota = np.maximum(1, np.round(groups[y].transform('size') * (max_points / len(df))))
+    return shuffled[groups.cumcount() < quota]
+
+# One connection for every query in this render instead of a checkout per query;
+# connectorx connects by URL itself, so no pool slot is checked out for it.
+# All queries run here and the connection is released before rendering, so
+# query errors and Streamlit's rerun/stop exceptions cannot leak it.
+conn = get_engine().connect() if cx is None else None
+try:
+    core = load_core_incremental(_conn=conn)
+    # Sidebar record counts (one round trip for both)
+    counts = load_data("""
+        SELECT
+            (SELECT COUNT(*) FROM etenders_pdf WHERE pdf_parsed) as pdfs,
+            (SELECT COUNT(*) FROM cpv_checker WHERE has_validated_cpv) as cpvs
+    """, _conn=conn).iloc[0]
+finally:
+    if conn is not None:
+        conn.close()
+
+is_recommended = core['should_bid'].eq(True)
+has_value = core['value'].notna()
+recommended_df = core[is_recommended]
+
 # Header
 st.title("🇮🇪 eTenders Intelligence Dashboard")
 st.markdown("---")
 
-# Key Metrics Row
+# Key Metrics Row - computed from the single core query
+total_tenders = len(core)
+analyzed = int(core['analyzed'].sum())
+recommended = int(is_recommended.sum())
+
 col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
-    total_tenders = load_data("SELECT COUNT(*) as count FROM etenders_core")
-    st.metric("Total Tenders", f"{total_tenders['count'].iloc[0]:,}")
+    st.metric("Total Tenders", f"{total_tenders:,}")
 
 with col2:
-    analyzed = load_data("SELECT COUNT(*) as count FROM bid_analysis")
-    st.metric("AI Analyzed", f"{analyzed['count'].iloc[0]:,}")
+    st.metric("AI Analyzed", f"{analyzed:,}")
 
 with col3:
-    recommended = load_data("""
-        SELECT COUNT(*) as count 
-        FROM bid_analysis 
-        WHERE should_bid = TRUE
-    """)
-    st.metric("🎯 Recommended Bids", f"{recommended['count'].iloc[0]:,}", 
-              delta=f"{(recommended['count'].iloc[0] / total_tenders['count'].iloc[0] * 100):.1f}%" if total_tenders['count'].iloc[0] > 0 else "0%")
+    st.metric("🎯 Recommended Bids", f"{recommended:,}", 
+              delta=f"{(recommended / total_tenders * 100):.1f}%" if total_tenders > 0 else "0%")
 
 with col4:
-    total_value = load_data("""
-        SELECT COALESCE(SUM(ec.estimated_value_numeric), 0) as total
-        FROM etenders_core ec
-        JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-        WHERE ba.should_bid = TRUE
-        AND ec.estimated_value_numeric IS NOT NULL
-    """)
-    value = total_value['total'].iloc[0]
+    value = recommended_df['value'].sum()
     st.metric("💰 Recommended Value", f"€{value:,.0f}" if value else "€0")
 
 with col5:
-    avg_confidence = load_data("""
-        SELECT AVG(confidence) as avg
-        FROM bid_analysis
-        WHERE should_bid = TRUE
-    """)
-    conf = avg_confidence['avg'].iloc[0]
+    conf = recommended_df['confidence'].mean()
     st.metric("Avg Confidence", f"{conf:.0%}" if pd.notna(conf) else "N/A")
 
 st.markdown("---")
@@ -87,18 +279,8 @@ with col_left:
     st.subheader("📊 AI Bid Recommendations")
     
     # Pie chart of recommendations
-    bid_breakdown = load_data("""
-        SELECT 
-            CASE 
-                WHEN should_bid = TRUE THEN 'Recommended'
-                WHEN should_bid = FALSE THEN 'Not Recommended'
-                ELSE 'Not Analyzed'
-            END as recommendation,
-            COUNT(*) as count
-        FROM etenders_core ec
-        LEFT JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-        GROUP BY recommendation
-    """)
+    recommendation = core['should_bid'].map({True: 'Recommended', False: 'Not Recommended'}).fillna('Not Analyzed')
+    bid_breakdown = recommendation.value_counts().rename_axis('recommendation').reset_index(name='count')
     
     fig_pie = px.pie(
         bid_breakdown, 
@@ -120,19 +302,14 @@ with col_right:
     st.subheader("💵 Value by Recommendation")
     
     # Bar chart of value distribution
-    value_breakdown = load_data("""
-        SELECT 
-            CASE 
-                WHEN ba.should_bid = TRUE THEN 'Recommended'
-                WHEN ba.should_bid = FALSE THEN 'Not Recommended'
-            END as recommendation,
-            COUNT(*) as tender_count,
-            COALESCE(SUM(ec.estimated_value_numeric), 0) as total_value
-        FROM etenders_core ec
-        JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-        WHERE ec.estimated_value_numeric IS NOT NULL
-        GROUP BY recommendation
-    """)
+    valued_analyzed = core[core['analyzed'] & has_value]
+    value_breakdown = (
+        valued_analyzed
+        .assign(recommendation=valued_analyzed['should_bid'].map({True: 'Recommended', False: 'Not Recommended'}))
+        .groupby('recommendation')
+        .agg(tender_count=('resource_id', 'size'), total_value=('value', 'sum'))
+        .reset_index()
+    )
     
     fig_bar = px.bar(
         value_breakdown,
@@ -152,19 +329,14 @@ with col_right:
 
 # Confidence distribution
 st.subheader("🎲 AI Confidence Distribution")
-confidence_data = load_data("""
-    SELECT 
-        confidence,
-        should_bid,
-        estimated_value_numeric as value
-    FROM bid_analysis ba
-    JOIN etenders_core ec ON ba.resource_id = ec.resource_id
-    WHERE confidence IS NOT NULL
-""")
+# confidence is float32 - plenty of precision for plotting
+confidence_data = core.loc[core['analyzed'] & core['confidence'].notna(), ['confidence', 'should_bid', 'value']]
 
 if len(confidence_data) > 0:
     fig_scatter = px.scatter(
-        confidence_data,
+        # Confidence is a handful of discrete levels, so sample within each
+        # level rather than thinning along x
+        sample_scatter(confidence_data, 'value', by=['confidence', 'should_bid']),
         x='confidence',
         y='value',
         color='should_bid',
@@ -174,40 +346,27 @@ if len(confidence_data) > 0:
             'value': 'Estimated Value (€)',
             'should_bid': 'Recommended'
         },
-        hover_data={'confidence': ':.0%', 'value': ':,.0f'}
+        hover_data={'confidence': ':.0%', 'value': ':,.0f'},
+        render_mode='webgl'
     )
-    fig_scatter.update_layout(height=400, xaxis_tickformat='.0%', yaxis_tickformat='€,.0f')
+    # Confidence is a handful of discrete levels, so unified x hover would list
+    # every point in a column; keep closest-point hover within a few pixels
+    fig_scatter.update_layout(height=400, xaxis_tickformat='.0%', yaxis_tickformat='€,.0f',
+                              hovermode='closest', hoverdistance=5)
     st.plotly_chart(fig_scatter, use_container_width=True)
 else:
     st.info("No confidence data available yet")
 
 # Value Distribution
 st.subheader("💰 Value Distribution - Recommended Bids")
-value_dist_data = load_data("""
-    SELECT 
-        CASE 
-            WHEN ec.estimated_value_numeric < 50000 THEN '< €50k'
-            WHEN ec.estimated_value_numeric < 100000 THEN '€50k - €100k'
-            WHEN ec.estimated_value_numeric < 250000 THEN '€100k - €250k'
-            WHEN ec.estimated_value_numeric < 500000 THEN '€250k - €500k'
-            ELSE '> €500k'
-        END as value_range,
-        COUNT(*) as tender_count,
-        COALESCE(SUM(ec.estimated_value_numeric), 0) as total_value
-    FROM etenders_core ec
-    JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-    WHERE ba.should_bid = TRUE
-    AND ec.estimated_value_numeric IS NOT NULL
-    GROUP BY value_range
-    ORDER BY MIN(ec.estimated_value_numeric)
-""")
+value_dist_data = bucket_values(recommended_df['value'])
 
 if len(value_dist_data) > 0:
     fig_value_dist = go.Figure()
     fig_value_dist.add_trace(go.Bar(
         x=value_dist_data['value_range'],
         y=value_dist_data['tender_count'],
-        text=value_dist_data['total_value'].apply(lambda x: f"€{x:,.0f}"),
+        text=format_column(value_dist_data['total_value'], '€{:,.0f}'),
         textposition='outside',
         marker_color='#00CC66',
         hovertemplate='<b>%{x}</b><br>Count: %{y}<br>Total Value: %{text}<extra></extra>'
@@ -225,40 +384,15 @@ else:
 # Top Recommended Tenders with Known Value
 st.subheader("🏆 Top Recommended Opportunities (Known Value)")
 
-top_tenders_valued = load_data("""
-    SELECT 
-        ec.resource_id,
-        ec.title,
-        ec.contracting_authority,
-        ec.estimated_value_numeric as value,
-        ec.submission_deadline_parsed as deadline,
-        ba.confidence,
-        ba.reasoning
-    FROM etenders_core ec
-    JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-    WHERE ba.should_bid = TRUE
-    AND ec.estimated_value_numeric IS NOT NULL
-    ORDER BY ec.estimated_value_numeric DESC, ba.confidence DESC
-    LIMIT 10
-""")
+top_tenders_valued = (
+    recommended_df[recommended_df['value'].notna()]
+    .sort_values(['value', 'confidence'], ascending=False)
+    .head(10)
+    [['resource_id', 'title', 'contracting_authority', 'value', 'deadline', 'confidence', 'reasoning']]
+)
 
 if len(top_tenders_valued) > 0:
-    # Format the dataframe
-    display_df_valued = top_tenders_valued.copy()
-    display_df_valued['value'] = display_df_valued['value'].apply(lambda x: f"€{x:,.0f}" if pd.notna(x) else "N/A")
-    display_df_valued['confidence'] = display_df_valued['confidence'].apply(lambda x: f"{x:.0%}" if pd.notna(x) else "N/A")
-    display_df_valued['deadline'] = pd.to_datetime(display_df_valued['deadline']).dt.strftime('%Y-%m-%d')
-    
-    # Rename columns for display
-    display_df_valued = display_df_valued.rename(columns={
-        'resource_id': 'ID',
-        'title': 'Title',
-        'contracting_authority': 'Authority',
-        'value': 'Value',
-        'deadline': 'Deadline',
-        'confidence': 'Confidence',
-        'reasoning': 'AI Reasoning'
-    })
+    display_df_valued = format_tender_table(top_tenders_valued)
     
     st.dataframe(
         display_df_valued,
@@ -275,37 +409,15 @@ else:
 # Top Recommended Tenders with Unknown Value
 st.subheader("🏆 Top Recommended Opportunities (Unknown Value)")
 
-top_tenders_unknown = load_data("""
-    SELECT 
-        ec.resource_id,
-        ec.title,
-        ec.contracting_authority,
-        ec.submission_deadline_parsed as deadline,
-        ba.confidence,
-        ba.reasoning
-    FROM etenders_core ec
-    JOIN bid_analysis ba ON ec.resource_id = ba.resource_id
-    WHERE ba.should_bid = TRUE
-    AND ec.estimated_value_numeric IS NULL
-    ORDER BY ba.confidence DESC
-    LIMIT 10
-""")
+top_tenders_unknown = (
+    recommended_df[recommended_df['value'].isna()]
+    .sort_values('confidence', ascending=False)
+    .head(10)
+    [['resource_id', 'title', 'contracting_authority', 'deadline', 'confidence', 'reasoning']]
+)
 
 if len(top_tenders_unknown) > 0:
-    # Format the dataframe
-    display_df_unknown = top_tenders_unknown.copy()
-    display_df_unknown['confidence'] = display_df_unknown['confidence'].apply(lambda x: f"{x:.0%}" if pd.notna(x) else "N/A")
-    display_df_unknown['deadline'] = pd.to_datetime(display_df_unknown['deadline']).dt.strftime('%Y-%m-%d')
-    
-    # Rename columns for display
-    display_df_unknown = display_df_unknown.rename(columns={
-        'resource_id': 'ID',
-        'title': 'Title',
-        'contracting_authority': 'Authority',
-        'deadline': 'Deadline',
-        'confidence': 'Confidence',
-        'reasoning': 'AI Reasoning'
-    })
+    display_df_unknown = format_tender_table(top_tenders_unknown)
     
     st.dataframe(
         display_df_unknown,
@@ -323,29 +435,14 @@ else:
 with st.sidebar:
     st.header("📈 Database Stats")
     
-    # Record counts
-    st.metric("PDFs Parsed", load_data("SELECT COUNT(*) as c FROM etenders_pdf WHERE pdf_parsed = TRUE")['c'].iloc[0])
-    st.metric("CPV Validated", load_data("SELECT COUNT(*) as c FROM cpv_checker WHERE has_validated_cpv = TRUE")['c'].iloc[0])
+    st.metric("PDFs Parsed", int(counts['pdfs']))
+    st.metric("CPV Validated", int(counts['cpvs']))
     
     st.markdown("---")
     
     # Value ranges
     st.subheader("Value Distribution")
-    value_ranges = load_data("""
-        SELECT 
-            CASE 
-                WHEN estimated_value_numeric < 50000 THEN '< €50k'
-                WHEN estimated_value_numeric < 100000 THEN '€50k - €100k'
-                WHEN estimated_value_numeric < 250000 THEN '€100k - €250k'
-                WHEN estimated_value_numeric < 500000 THEN '€250k - €500k'
-                ELSE '> €500k'
-            END as range,
-            COUNT(*) as count
-        FROM etenders_core
-        WHERE estimated_value_numeric IS NOT NULL
-        GROUP BY range
-        ORDER BY MIN(estimated_value_numeric)
-    """)
+    value_ranges = bucket_values(core['value']).rename(columns={'value_range': 'range', 'tender_count': 'count'})
     
     for _, row in value_ranges.iterrows():
         st.text(f"{row['range']}: {row['count']}")
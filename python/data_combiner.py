@@ -2,12 +2,80 @@
 Data combiner - joins tender, PDF, and CPV data using resource_id as key
 """
 
-import json
 import csv
+import json
+import orjson
 from typing import Dict, Any, List, Optional
 
 
-def load_json_data(tenders_file: str, pdfs_file: str, cpvs_file: str) -> List[Dict[str, Any]]:
+def _load_json_list(filepath: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Parse a JSON array file (or JSON Lines, for .jsonl paths) with orjson.
+    
+    Args:
+        filepath: Path to JSON file
+        columns: Fields to keep (plus resource_id); None keeps all
+        
+    Returns:
+        List of records
+    """
+    with open(filepath, 'rb') as f:
+        if filepath.endswith('.jsonl'):
+            records = [orjson.loads(line) for line in f if line.strip()]
+        else:
+            records = orjson.loads(f.read())
+    
+    if columns is None:
+        return records
+    keep = ['resource_id'] + [c for c in columns if c != 'resource_id']
+    return [{k: r[k] for k in keep if k in r} for r in records]
+
+
+def _load_csv_records(filepath: str, columns: Optional[List[str]] = None) -> Dict[int, Dict[str, str]]:
+    """
+    Parse a CSV file into records keyed by integer resource_id.
+    
+    csv.DictReader keeps quoted multi-line cells (such as pdf_content) and
+    the repo's ragged rows intact, and leaves every value as a string.
+    
+    Args:
+        filepath: Path to CSV file
+        columns: Columns to keep (plus resource_id); None keeps all
+        
+    Returns:
+        Dictionary mapping resource_id to row dictionary
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if columns is None:
+            return {int(row['resource_id']): row for row in reader}
+        keep = ['resource_id'] + [c for c in columns if c != 'resource_id']
+        return {int(row['resource_id']): {k: row[k] for k in keep if k in row} for row in reader}
+
+
+def _join_records(tenders: Dict[Any, Dict[str, Any]], pdfs: Dict[Any, Dict[str, Any]],
+                  cpvs: Dict[Any, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Left join PDF and CPV records onto tenders by resource_id.
+    
+    Args:
+        tenders: Tender records keyed by resource_id
+        pdfs: PDF records keyed by resource_id
+        cpvs: CPV records keyed by resource_id
+        
+    Returns:
+        List of combined records
+    """
+    pdf_get = pdfs.get
+    cpv_get = cpvs.get
+    return [
+        {'resource_id': resource_id, 'tender': tender, 'pdf': pdf_get(resource_id), 'cpv': cpv_get(resource_id)}
+        for resource_id, tender in tenders.items()
+    ]
+
+
+def load_json_data(tenders_file: str, pdfs_file: str, cpvs_file: str,
+                   columns: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
     """
     Load and combine JSON data from three separate files.
     
@@ -15,41 +83,32 @@ def load_json_data(tenders_file: str, pdfs_file: str, cpvs_file: str) -> List[Di
         tenders_file: Path to tenders JSON file
         pdfs_file: Path to PDFs JSON file
         cpvs_file: Path to CPVs JSON file
+        columns: Optional fields to load per source, keyed 'tender', 'pdf'
+            and 'cpv'; sources not listed load every field
         
     Returns:
         List of combined records with all data joined by resource_id
     """
+    columns = columns or {}
+    
     # Load all files
-    with open(tenders_file, 'r', encoding='utf-8') as f:
-        tenders = {t['resource_id']: t for t in json.load(f)}
+    tenders = {t['resource_id']: t for t in _load_json_list(tenders_file, columns.get('tender'))}
     
     try:
-        with open(pdfs_file, 'r', encoding='utf-8') as f:
-            pdfs = {p['resource_id']: p for p in json.load(f)}
+        pdfs = {p['resource_id']: p for p in _load_json_list(pdfs_file, columns.get('pdf'))}
     except (FileNotFoundError, json.JSONDecodeError):
         pdfs = {}
     
     try:
-        with open(cpvs_file, 'r', encoding='utf-8') as f:
-            cpvs = {c['resource_id']: c for c in json.load(f)}
+        cpvs = {c['resource_id']: c for c in _load_json_list(cpvs_file, columns.get('cpv'))}
     except (FileNotFoundError, json.JSONDecodeError):
         cpvs = {}
     
-    # Combine data
-    combined = []
-    for resource_id, tender in tenders.items():
-        record = {
-            'resource_id': resource_id,
-            'tender': tender,
-            'pdf': pdfs.get(resource_id),
-            'cpv': cpvs.get(resource_id)
-        }
-        combined.append(record)
-    
-    return combined
+    return _join_records(tenders, pdfs, cpvs)
 
 
-def load_csv_data(tenders_file: str, pdfs_file: str, cpvs_file: str) -> List[Dict[str, Any]]:
+def load_csv_data(tenders_file: str, pdfs_file: str, cpvs_file: str,
+                  columns: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
     """
     Load and combine CSV data from three separate files.
     
@@ -57,45 +116,32 @@ def load_csv_data(tenders_file: str, pdfs_file: str, cpvs_file: str) -> List[Dic
         tenders_file: Path to tenders CSV file
         pdfs_file: Path to PDFs CSV file
         cpvs_file: Path to CPVs CSV file
+        columns: Optional fields to load per source, keyed 'tender', 'pdf'
+            and 'cpv'; sources not listed load every field
         
     Returns:
         List of combined records with all data joined by resource_id
     """
+    columns = columns or {}
+    
     # Load tenders
-    with open(tenders_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        tenders = {int(row['resource_id']): row for row in reader}
+    tenders = _load_csv_records(tenders_file, columns.get('tender'))
     
     # Load PDFs
     pdfs = {}
     try:
-        with open(pdfs_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            pdfs = {int(row['resource_id']): row for row in reader}
+        pdfs = _load_csv_records(pdfs_file, columns.get('pdf'))
     except FileNotFoundError:
         pass
     
     # Load CPVs
     cpvs = {}
     try:
-        with open(cpvs_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            cpvs = {int(row['resource_id']): row for row in reader}
+        cpvs = _load_csv_records(cpvs_file, columns.get('cpv'))
     except FileNotFoundError:
         pass
     
-    # Combine data
-    combined = []
-    for resource_id, tender in tenders.items():
-        record = {
-            'resource_id': resource_id,
-            'tender': tender,
-            'pdf': pdfs.get(resource_id),
-            'cpv': cpvs.get(resource_id)
-        }
-        combined.append(record)
-    
-    return combined
+    return _join_records(tenders, pdfs, cpvs)
 
 
 def load_postgres_data(connection_string: str) -> List[Dict[str, Any]]:
@@ -109,34 +155,43 @@ def load_postgres_data(connection_string: str) -> List[Dict[str, Any]]:
         List of combined records with all data joined by resource_id
     """
     import psycopg2
-    from psycopg2.extras import RealDictCursor
     
     conn = psycopg2.connect(connection_string)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
     
-    # Query with LEFT JOINs to get all data
+    # Query with LEFT JOINs to get all data. Marker columns split the
+    # flat row into its tender/pdf/cpv parts without per-row JSON encoding.
     query = """
         SELECT 
             t.*,
-            row_to_json(p.*) as pdf_data,
-            row_to_json(c.*) as cpv_data
-        FROM tenders t
-        LEFT JOIN pdfs p ON t.resource_id = p.resource_id
-        LEFT JOIN cpvs c ON t.resource_id = c.resource_id
+            NULL AS __pdf__,
+            p.*,
+            NULL AS __cpv__,
+            c.*
+        FROM etenders_core t
+        LEFT JOIN etenders_pdf p ON t.resource_id = p.resource_id
+        LEFT JOIN cpv_checker c ON t.resource_id = c.resource_id
     """
     
     cursor.execute(query)
-    rows = cursor.fetchall()
+    columns = [col[0] for col in cursor.description]
+    pdf_start = columns.index('__pdf__') + 1
+    cpv_start = columns.index('__cpv__') + 1
+    tender_cols = columns[:pdf_start - 1]
+    pdf_cols = columns[pdf_start:cpv_start - 1]
+    cpv_cols = columns[cpv_start:]
+    tender_id = tender_cols.index('resource_id')
+    pdf_id = pdf_start + pdf_cols.index('resource_id')
+    cpv_id = cpv_start + cpv_cols.index('resource_id')
     
     combined = []
-    for row in rows:
-        record = {
-            'resource_id': row['resource_id'],
-            'tender': dict(row),
-            'pdf': row.get('pdf_data'),
-            'cpv': row.get('cpv_data')
-        }
-        combined.append(record)
+    for row in cursor.fetchall():
+        combined.append({
+            'resource_id': row[tender_id],
+            'tender': dict(zip(tender_cols, row[:pdf_start - 1])),
+            'pdf': dict(zip(pdf_cols, row[pdf_start:cpv_start - 1])) if row[pdf_id] is not None else None,
+            'cpv': dict(zip(cpv_cols, row[cpv_start:])) if row[cpv_id] is not None else None
+        })
     
     cursor.close()
     conn.close()
@@ -150,7 +205,8 @@ def combine_data(source_type: str, **kwargs) -> List[Dict[str, Any]]:
     
     Args:
         source_type: 'json', 'csv', or 'postgres'
-        **kwargs: Source-specific arguments (file paths or connection string)
+        **kwargs: Source-specific arguments (file paths or connection string,
+            plus optional per-source columns for file sources)
         
     Returns:
         List of combined records
@@ -159,13 +215,15 @@ def combine_data(source_type: str, **kwargs) -> List[Dict[str, Any]]:
         return load_json_data(
             kwargs['tenders_file'],
             kwargs['pdfs_file'],
-            kwargs['cpvs_file']
+            kwargs['cpvs_file'],
+            kwargs.get('columns')
         )
     elif source_type == 'csv':
         return load_csv_data(
             kwargs['tenders_file'],
             kwargs['pdfs_file'],
-            kwargs['cpvs_file']
+            kwargs['cpvs_file'],
+            kwargs.get('columns')
         )
     elif source_type == 'postgres':
         return load_postgres_data(kwargs['connection_string'])
@@ -4,152 +4,519 @@ Scrapes tender data from the eTenders website
 Yields individual records for pipeline processing
 """
 
+import csv
 import logging
+import os
+import threading
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from bs4 import BeautifulSoup, NavigableString, SoupStrainer, UnicodeDammit
 import time
-from typing import Generator, Dict
+from operator import itemgetter
+from typing import Generator, Dict, Iterable, List, Optional
 import re
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional - falls back to lxml parsing
+    LexborHTMLParser = None
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # optional - falls back to BeautifulSoup parsing
+    lxml_html = None
+
 logger = logging.getLogger(__name__)
 
+ETENDERS_BASE_URL = "https://www.etenders.gov.ie"
+
+# Pages fetched concurrently by scrape_pages
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '8'))
+
+# Shared session - reuses TCP/TLS connections across pages and threads
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    # Mimic a browser request
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html',
+    # Result pages are repetitive HTML that compresses several times over
+    'Accept-Encoding': 'gzip, deflate'
+})
+# Transient server errors, rate limiting and dropped connections are retried
+# on the pooled connection with exponential backoff, honouring Retry-After
+_RETRY = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+               respect_retry_after_header=True)
+_SESSION.mount('https://', HTTPAdapter(pool_connections=SCRAPE_CONCURRENCY, pool_maxsize=SCRAPE_CONCURRENCY,
+                                       max_retries=_RETRY))
+
+# Multi-page scrapes print progress every this many pages
+PROGRESS_EVERY_PAGES = 10
+
+# Default sidecar for conditional re-scrapes (see PageCache)
+PAGE_CACHE_FILE = os.getenv('ETENDERS_PAGE_CACHE', 'etenders_cache.json')
+
+# Compiled once and reused for every page
+if lxml_html is not None:
+    _XP_TABLE = etree.XPath('//table[@id="T01"]')
+    _XP_ROWS = etree.XPath('.//tr')
+    _XP_CELLS = etree.XPath('.//td')
+    _XP_TEXT = etree.XPath('.//text()')
+    _XP_FIRST_HREF = etree.XPath('(.//a)[1]/@href')
+
+
+def _absolute_url(href: str) -> str:
+    """Make a site-relative link absolute."""
+    return f"{ETENDERS_BASE_URL}{href}" if href.startswith('/') else href
+
+
+# Fields of every scraped tender record, in output column order
+TENDER_FIELDS = (
+    'row_number', 'title', 'detail_url', 'resource_id', 'contracting_authority',
+    'info', 'date_published', 'submission_deadline', 'procedure', 'status',
+    'notice_pdf_url', 'award_date', 'estimated_value', 'cycle'
+)
+
+# Cells in a full results row; later cells are never read
+ROW_COLUMNS = 13
+
+
+def _build_tender(texts: List[str], title_href: Optional[str], pdf_href: Optional[str]) -> Dict[str, str]:
+    """
+    Build a tender record from a row's stripped cell texts and links.
+    
+    Args:
+        texts: Text of each cell (9 to ROW_COLUMNS)
+        title_href: href of the first link in the title cell, if any
+        pdf_href: href of the first link in the notice PDF cell, if any
+        
+    Returns:
+        Tender data dictionary
+    """
+    # Pad short rows once instead of bounds-checking each optional column
+    if len(texts) < ROW_COLUMNS:
+        texts = texts + [''] * (ROW_COLUMNS - len(texts))
+    return {
+        'row_number': texts[0],
+        'title': texts[1],
+        'detail_url': _absolute_url(title_href) if title_href else '',
+        'resource_id': texts[2],
+        'contracting_authority': texts[3],
+        'info': texts[4],
+        'date_published': texts[5],
+        'submission_deadline': texts[6],
+        'procedure': texts[7],
+        'status': texts[8],
+        # Optional trailing columns: notice PDF (9), award date (10),
+        # estimated value (11), cycle (12)
+        'notice_pdf_url': _absolute_url(pdf_href) if pdf_href else '',
+        'award_date': texts[10],
+        'estimated_value': texts[11],
+        'cycle': texts[12]
+    }
+
+
+def _decode_page(content: bytes) -> str:
+    """Decode page bytes; lxml would otherwise assume Latin-1 without a charset."""
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        # Same detection BeautifulSoup applies
+        return UnicodeDammit(content).unicode_markup
+
+
+def _parse_rows_lexbor(content: bytes) -> Optional[List[Dict[str, str]]]:
+    """Parse tender rows with selectolax's Lexbor backend; None if the results table is missing."""
+    table = LexborHTMLParser(_decode_page(content)).css_first('table#T01')
+    if table is None:
+        return None
+    
+    tenders = []
+    for row in table.css('tr')[1:]:  # Skip header row
+        cols = row.css('td')
+        
+        # Skip empty rows or rows without enough columns
+        if len(cols) < 9:
+            continue
+        
+        texts = [col.text(strip=True) for col in cols[:ROW_COLUMNS]]
+        title_link = cols[1].css_first('a')
+        pdf_link = cols[9].css_first('a') if len(cols) > 9 else None
+        tenders.append(_build_tender(texts, title_link.attributes.get('href') if title_link else None,
+                                     pdf_link.attributes.get('href') if pdf_link else None))
+    return tenders
+
+
+def _parse_rows_lxml(content: bytes) -> Optional[List[Dict[str, str]]]:
+    """Parse tender rows with lxml; None if the results table is missing."""
+    tables = _XP_TABLE(lxml_html.fromstring(_decode_page(content)))
+    if not tables:
+        return None
+    
+    tenders = []
+    for row in _XP_ROWS(tables[0])[1:]:  # Skip header row
+        cols = _XP_CELLS(row)
+        
+        # Skip empty rows or rows without enough columns
+        if len(cols) < 9:
+            continue
+        
+        # Same text as BeautifulSoup's get_text(strip=True)
+        texts = [''.join(t.strip() for t in _XP_TEXT(col)) for col in cols[:ROW_COLUMNS]]
+        title_href = _XP_FIRST_HREF(cols[1])
+        pdf_href = _XP_FIRST_HREF(cols[9]) if len(cols) > 9 else None
+        tenders.append(_build_tender(texts, title_href[0] if title_href else None,
+                                     pdf_href[0] if pdf_href else None))
+    return tenders
+
+
+# Only the results table is consumed; the fallback parser skips the rest
+_T01_STRAINER = SoupStrainer('table', id='T01')
 
-def scrape_etenders_page(page_number: int) -> Generator[Dict[str, str], None, None]:
+
+def _cell_text(td) -> str:
+    """get_text(strip=True) with a fast path for cells holding a single text node."""
+    text = td.string
+    if type(text) is NavigableString:  # excludes comments, which get_text skips
+        return text.strip()
+    return td.get_text(strip=True)
+
+
+def _parse_rows_bs4(content: bytes) -> Optional[List[Dict[str, str]]]:
+    """Parse tender rows with BeautifulSoup; None if the results table is missing."""
+    soup = BeautifulSoup(content, 'html.parser', parse_only=_T01_STRAINER)
+    table = soup.find('table', {'id': 'T01'})
+    if not table:
+        return None
+    
+    tenders = []
+    for row in table.find_all('tr')[1:]:  # Skip header row
+        cols = row.find_all('td')
+        
+        # Skip empty rows or rows without enough columns
+        if len(cols) < 9:
+            continue
+        
+        texts = [_cell_text(col) for col in cols[:ROW_COLUMNS]]
+        title_link = cols[1].find('a')
+        pdf_link = cols[9].find('a') if len(cols) > 9 else None
+        tenders.append(_build_tender(texts, title_link.get('href') if title_link else None,
+                                     pdf_link.get('href') if pdf_link else None))
+    return tenders
+
+
+# Fastest parser available: Lexbor, then libxml2, then BeautifulSoup
+if LexborHTMLParser is not None:
+    _parse_rows = _parse_rows_lexbor
+elif lxml_html is not None:
+    _parse_rows = _parse_rows_lxml
+else:
+    _parse_rows = _parse_rows_bs4
+
+
+class PageCache:
+    """
+    HTTP validators and parsed rows per results page, persisted as JSON.
+    
+    Re-scrapes send conditional GETs from the stored ETag/Last-Modified; a
+    304 reply reuses the stored rows without downloading or parsing the page.
+    """
+    
+    def __init__(self, path: str = PAGE_CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'rb') as f:
+                self.pages = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            self.pages = {}
+    
+    def get(self, page_number: int) -> Optional[Dict]:
+        """Return the cached entry for a page, if any."""
+        return self.pages.get(str(page_number))
+    
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers from a cached entry."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def put(self, page_number: int, response: requests.Response, tenders: List[Dict[str, str]]) -> None:
+        """Store a page's rows with its response validators (skipped if it has none)."""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified):
+            return
+        with self.lock:
+            self.pages[str(page_number)] = {'etag': etag, 'last_modified': last_modified, 'tenders': tenders}
+    
+    def save(self) -> None:
+        """Write the cache back to its sidecar file."""
+        with self.lock:
+            data = orjson.dumps(self.pages)
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+
+class _RateLimiter:
+    """Spaces request start times at least `interval` seconds apart across threads."""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+    
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        time.sleep(start - now)
+
+
+def scrape_etenders_page(page_number: int, session: requests.Session = _SESSION) -> Generator[Dict[str, str], None, None]:
     """
     Scrape tender data from a single page of eTenders website.
     Yields individual tender records for pipeline processing.
     
     Args:
         page_number: The page number to scrape (1-231)
+        session: HTTP session to fetch with
         
     Yields:
         Dictionary containing tender data for each record
     """
+    yield from fetch_page_tenders(page_number, session)
+
+
+def fetch_page_tenders(page_number: int, session: requests.Session = _SESSION,
+                       cache: Optional[PageCache] = None) -> List[Dict[str, str]]:
+    """
+    Fetch and parse a single page of eTenders website.
+    
+    Args:
+        page_number: The page number to scrape (1-231)
+        session: HTTP session to fetch with
+        cache: Page cache for conditional requests (optional)
+        
+    Returns:
+        Tender data dictionaries (empty if the page failed)
+    """
     url = f"https://www.etenders.gov.ie/epps/quickSearchAction.do?d-3680175-p={page_number}&searchType=cftFTS&latest=true"
     
     logger.info(f"Scraping page {page_number} from eTenders.gov.ie")
-    print(f"Scraping page {page_number}...")
     
     try:
-        # Add headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
         logger.debug(f"Fetching URL: {url}")
-        response = requests.get(url, headers=headers, timeout=30)
+        cached = cache.get(page_number) if cache is not None else None
+        response = session.get(url, timeout=30, headers=PageCache.conditional_headers(cached))
         response.raise_for_status()
-        logger.debug(f"Response received: {len(response.content)} bytes")
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        if cached is not None and response.status_code == 304:
+            logger.info(f"Page {page_number} not modified: {len(cached['tenders'])} cached records")
+            return cached['tenders']
+        
+        logger.debug(f"Response received: {len(response.content)} bytes")
         
-        # Find the table containing tender data
-        table = soup.find('table', {'id': 'T01'})
+        tenders = _parse_rows(response.content)
         
-        if not table:
+        if tenders is None:
             logger.warning(f"No table found on page {page_number}")
             print(f"Warning: No table found on page {page_number}")
-            return
+            return []
         
-        # Find all table rows (skip header row)
-        rows = table.find_all('tr')
-        logger.debug(f"Found {len(rows)-1} tender rows on page {page_number}")
+        if cache is not None:
+            cache.put(page_number, response, tenders)
         
-        record_count = 0
-        for row in rows[1:]:  # Skip header row
-            cols = row.find_all('td')
-            
-            # Skip empty rows or rows without enough columns
-            if len(cols) < 9:
-                continue
-            
-            # Extract title and detail URL
-            title_cell = cols[1]
-            title = title_cell.get_text(strip=True)
-            detail_url = ''
-            title_link = title_cell.find('a')
-            if title_link and title_link.get('href'):
-                detail_url = title_link.get('href')
-                if detail_url.startswith('/'):
-                    detail_url = f"https://www.etenders.gov.ie{detail_url}"
-            
-            # Extract data from columns based on actual structure
-            tender_data = {
-                'row_number': cols[0].get_text(strip=True),
-                'title': title,
-                'detail_url': detail_url,
-                'resource_id': cols[2].get_text(strip=True),
-                'contracting_authority': cols[3].get_text(strip=True),
-                'info': cols[4].get_text(strip=True),
-                'date_published': cols[5].get_text(strip=True),
-                'submission_deadline': cols[6].get_text(strip=True),
-                'procedure': cols[7].get_text(strip=True),
-                'status': cols[8].get_text(strip=True),
-                'notice_pdf_url': '',
-                'award_date': '',
-                'estimated_value': '',
-                'cycle': ''
-            }
-            
-            # Extract Notice PDF URL if exists (column 9)
-            if len(cols) > 9:
-                notice_pdf_link = cols[9].find('a')
-                if notice_pdf_link and notice_pdf_link.get('href'):
-                    pdf_url = notice_pdf_link.get('href')
-                    # Make absolute URL if relative
-                    if pdf_url.startswith('/'):
-                        pdf_url = f"https://www.etenders.gov.ie{pdf_url}"
-                    tender_data['notice_pdf_url'] = pdf_url
-            
-            # Extract award date (column 10)
-            if len(cols) > 10:
-                tender_data['award_date'] = cols[10].get_text(strip=True)
-            
-            # Extract estimated value (column 11)
-            if len(cols) > 11:
-                tender_data['estimated_value'] = cols[11].get_text(strip=True)
-            
-            # Extract cycle (column 12)
-            if len(cols) > 12:
-                tender_data['cycle'] = cols[12].get_text(strip=True)
-            
-            record_count += 1
-            logger.debug(f"Yielding tender record: {tender_data.get('resource_id')}")
-            yield tender_data
-        
-        logger.info(f"Processed page {page_number}: {record_count} records")
-        print(f"Processed page {page_number}")
+        logger.info(f"Processed page {page_number}: {len(tenders)} records")
+        return tenders
         
     except requests.RequestException as e:
         logger.error(f"Network error scraping page {page_number}: {e}")
         print(f"Error scraping page {page_number}: {e}")
-        return
+        return []
     except Exception as e:
         logger.error(f"Unexpected error on page {page_number}: {e}", exc_info=True)
         print(f"Unexpected error on page {page_number}: {e}")
-        return
+        return []
 
 
-def scrape_pages(start_page: int = 1, end_page: int = 231, delay: float = 1.0) -> Generator[Dict[str, str], None, None]:
+def scrape_pages(start_page: int = 1, end_page: int = 231, delay: float = 1.0,
+                 max_workers: int = SCRAPE_CONCURRENCY,
+                 cache: Optional[PageCache] = None) -> Generator[Dict[str, str], None, None]:
     """
     Scrape tender data from multiple pages.
     Yields individual records for pipeline processing.
     
+    Pages are fetched concurrently over a shared session and yielded as each
+    page completes, so page order is not preserved.
+    
+    Args:
+        start_page: First page to scrape (default: 1)
+        end_page: Last page to scrape (default: 231)
+        delay: Minimum seconds between request starts across all workers (default: 1.0)
+        max_workers: Maximum number of pages fetched at once
+        cache: Page cache for conditional requests, saved when done (optional)
+        
+    Yields:
+        Individual tender data dictionaries
+    """
+    for tenders in scrape_page_batches(start_page, end_page, delay, max_workers, cache):
+        yield from tenders
+
+
+def scrape_all_pages(start_page: int = 1, end_page: int = 231,
+                     delay: float = 1.0) -> Generator[Dict[str, str], None, None]:
+    """
+    Scrape a range of pages, streaming records as they arrive.
+    
+    Generator form of the documented entry point, so peak memory stays at
+    roughly the pages in flight rather than the whole scrape. Pass the result
+    straight to export_to_csv to stream it to disk.
+    
     Args:
         start_page: First page to scrape (default: 1)
         end_page: Last page to scrape (default: 231)
-        delay: Delay between requests in seconds (default: 1.0)
+        delay: Minimum seconds between request starts across all workers (default: 1.0)
         
     Yields:
         Individual tender data dictionaries
     """
-    for page in range(start_page, end_page + 1):
-        for tender in scrape_etenders_page(page):
-            yield tender
+    yield from scrape_pages(start_page, end_page, delay)
+
+
+def scrape_page_batches(start_page: int = 1, end_page: int = 231, delay: float = 1.0,
+                        max_workers: int = SCRAPE_CONCURRENCY,
+                        cache: Optional[PageCache] = None) -> Generator[List[Dict[str, str]], None, None]:
+    """
+    Scrape multiple pages concurrently, yielding each page's records together.
+    
+    Args:
+        start_page: First page to scrape (default: 1)
+        end_page: Last page to scrape (default: 231)
+        delay: Minimum seconds between request starts across all workers (default: 1.0)
+        max_workers: Maximum number of pages fetched at once
+        cache: Page cache for conditional requests, saved when done (optional)
         
-        # Add delay to be respectful to the server
-        if page < end_page:
-            time.sleep(delay)
+    Yields:
+        List of tender data dictionaries for each completed page
+    """
+    # Be respectful to the server: request starts stay `delay` apart however many
+    # workers there are; concurrency only overlaps slow responses and parsing
+    limiter = _RateLimiter(delay)
+    
+    def fetch(page: int) -> List[Dict[str, str]]:
+        limiter.wait()
+        return fetch_page_tenders(page, cache=cache)
+    
+    total_pages = end_page - start_page + 1
+    pages_done = 0
+    records_done = 0
+    
+    def report(tenders: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        # Per-page detail goes to the logger; stdout only gets periodic progress
+        nonlocal pages_done, records_done
+        pages_done += 1
+        records_done += len(tenders)
+        if pages_done % PROGRESS_EVERY_PAGES == 0 or pages_done == total_pages:
+            print(f"  Progress: {pages_done}/{total_pages} pages, {records_done} records")
+        return tenders
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for page in range(start_page, end_page + 1):
+                pending.add(executor.submit(fetch, page))
+                
+                # Bound queued pages so results are yielded while scraping continues
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield report(future.result())
+            
+            # Drain remaining pages
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield report(future.result())
+    finally:
+        if cache is not None:
+            cache.save()
+
+
+def scrape_to_parquet(path: str, start_page: int = 1, end_page: int = 231, delay: float = 1.0,
+                      max_workers: int = SCRAPE_CONCURRENCY, cache: Optional[PageCache] = None) -> int:
+    """
+    Scrape pages straight into a Parquet file, one row group per page.
+    
+    Requires pyarrow. The file can be loaded later with
+    pyarrow.parquet.read_table(path).to_pandas().
+    
+    Args:
+        path: Output Parquet file path
+        start_page: First page to scrape (default: 1)
+        end_page: Last page to scrape (default: 231)
+        delay: Minimum seconds between request starts across all workers (default: 1.0)
+        max_workers: Maximum number of pages fetched at once
+        cache: Page cache for conditional requests, saved when done (optional)
+        
+    Returns:
+        Number of tender rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([(field, pa.string()) for field in TENDER_FIELDS])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for tenders in scrape_page_batches(start_page, end_page, delay, max_workers, cache):
+            if not tenders:
+                continue
+            columns = {field: [t[field] for t in tenders] for field in TENDER_FIELDS}
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            rows += len(tenders)
+    
+    logger.info(f"Wrote {rows} tenders to {path}")
+    return rows
+
+
+def export_to_csv(tenders: Iterable[Dict[str, str]], filename: str) -> int:
+    """
+    Write scraped tender records to a CSV file, one column per TENDER_FIELDS entry.
+    
+    Rows are pulled with a single itemgetter and written by csv.writer.writerows,
+    so records are consumed as they arrive and never held in memory together.
+    
+    Args:
+        tenders: Tender data dictionaries (any iterable, including generators)
+        filename: Output CSV file path
+        
+    Returns:
+        Number of tender rows written
+    """
+    row_of = itemgetter(*TENDER_FIELDS)
+    count = 0
+    
+    def rows():
+        nonlocal count
+        for tender in tenders:
+            count += 1
+            yield row_of(tender)
+    
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(TENDER_FIELDS)
+        writer.writerows(rows())
+    
+    print(f"✓ Exported {count} tenders to {filename}")
+    return count
 
 
 if __name__ == "__main__":
@@ -3,13 +3,32 @@ JSON output handler with error logging
 """
 
 import json
+import orjson
 from typing import Dict, Any, List
 from datetime import datetime
 import os
 
+# Large write buffer so big exports aren't bound by write() syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+# Datetimes go through default=str like json.dumps; int dict keys are allowed
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+# JSONL lines get their newline from orjson rather than a bytes concatenation
+JSONL_OPTIONS = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+
+
+def _dumps(obj: Any, option: int = ORJSON_OPTIONS) -> bytes:
+    """Serialize with orjson, falling back to json for values it rejects (e.g. huge ints)."""
+    try:
+        return orjson.dumps(obj, default=str, option=option)
+    except TypeError:
+        indent = 2 if option & orjson.OPT_INDENT_2 else None
+        newline = '\n' if option & orjson.OPT_APPEND_NEWLINE else ''
+        return (json.dumps(obj, default=str, indent=indent) + newline).encode('utf-8')
+
 
 class JSONOutput:
-    def __init__(self, output_file: str = 'output.json', log_file: str = 'json_output_errors.log', streaming: bool = True):
+    def __init__(self, output_file: str = 'output.json', log_file: str = 'json_output_errors.log', streaming: bool = True,
+                 fmt: str = 'json'):
         """
         Initialize JSON output handler.
         
@@ -17,19 +36,28 @@ class JSONOutput:
             output_file: Path to output JSON file
             log_file: Path to error log file
             streaming: If True, write records immediately; if False, buffer in memory
+            fmt: 'json' for a JSON array, or 'jsonl' for one object per line
+                (append-only, so the file is valid after every record)
         """
+        if fmt not in ('json', 'jsonl'):
+            raise ValueError(f"Unknown JSON format: {fmt}")
+        
         self.output_file = output_file
         self.log_file = log_file
         self.streaming = streaming
+        self.fmt = fmt
+        self.record_options = JSONL_OPTIONS if fmt == 'jsonl' else ORJSON_OPTIONS
         self.records = [] if not streaming else None
         self.error_count = 0
         self.records_written = 0
         self.file_handle = None
+        self.log_handle = None
         
         if streaming:
             # Open file and write opening bracket
-            self.file_handle = open(output_file, 'w', encoding='utf-8')
-            self.file_handle.write('[\n')
+            self.file_handle = open(output_file, 'wb', buffering=WRITE_BUFFER_SIZE)
+            if fmt == 'json':
+                self.file_handle.write(b'[\n')
         
     def write_record(self, record: Dict[str, Any]) -> bool:
         """
@@ -43,13 +71,14 @@ class JSONOutput:
         """
         try:
             # Test JSON serialization
-            json_str = json.dumps(record, default=str)
+            data = _dumps(record, self.record_options)
             
             if self.streaming:
                 # Write directly to file
-                if self.records_written > 0:
-                    self.file_handle.write(',\n')
-                self.file_handle.write('  ' + json_str)
+                if self.fmt == 'jsonl':
+                    self.file_handle.write(data)
+                else:
+                    self.file_handle.write((b',\n  ' if self.records_written > 0 else b'  ') + data)
                 self.records_written += 1
             else:
                 # Buffer in memory
@@ -68,30 +97,49 @@ class JSONOutput:
         if self.streaming:
             # Close the JSON array and file
             if self.file_handle:
-                self.file_handle.write('\n]\n')
+                if self.fmt == 'json':
+                    self.file_handle.write(b'\n]\n')
                 self.file_handle.close()
                 self.file_handle = None
             print(f"✓ Wrote {self.records_written} records to {self.output_file}")
+            self._close_log()
         else:
             # Write all buffered records
             try:
-                with open(self.output_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.records, f, indent=2, default=str)
+                with open(self.output_file, 'wb') as f:
+                    if self.fmt == 'jsonl':
+                        f.writelines(_dumps(record, JSONL_OPTIONS) for record in self.records)
+                    else:
+                        f.write(_dumps(self.records, ORJSON_OPTIONS | orjson.OPT_INDENT_2))
                 print(f"✓ Wrote {len(self.records)} records to {self.output_file}")
                 
             except Exception as e:
                 print(f"✗ Error writing JSON file: {e}")
                 self._log_error({'action': 'flush'}, str(e))
+            self._close_log()
     
     def _log_error(self, record: Dict[str, Any], error: str) -> None:
-        """Log errors to file."""
+        """Log errors to file, keeping the log open across errors."""
+        if self.log_handle is None:
+            self.log_handle = open(self.log_file, 'a', encoding='utf-8', buffering=1 << 16)
+        
         timestamp = datetime.now().isoformat()
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] JSON Serialization Error\n")
-            f.write(f"Error: {error}\n")
-            f.write(f"Record ID: {record.get('resource_id', 'unknown')}\n")
-            f.write(f"Record: {str(record)[:500]}...\n")
-            f.write("-" * 80 + "\n")
+        self.log_handle.write(
+            f"[{timestamp}] JSON Serialization Error\n"
+            f"Error: {error}\n"
+            f"Record ID: {record.get('resource_id', 'unknown')}\n"
+            f"Record: {str(record)[:500]}...\n"
+            + "-" * 80 + "\n"
+        )
+    
+    def _close_log(self) -> None:
+        """Close the error log if any errors were written."""
+        if self.log_handle is not None:
+            self.log_handle.close()
+            self.log_handle = None
+    
+    def __del__(self):
+        self._close_log()
     
     def get_stats(self) -> Dict[str, int]:
         """Get output statistics."""
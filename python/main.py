@@ -4,13 +4,23 @@ Configurable data pipeline with modular processing stages
 """
 
 import argparse
+import json
 import logging
+import os
 import sys
-from typing import Generator, Dict, Any
+import orjson
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Generator, Dict, Any, Iterable
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Records processed at once; PDF download and Ollama parsing are I/O bound
+PROCESS_CONCURRENCY = int(os.getenv('PROCESS_CONCURRENCY', '4'))
+
+# Records buffered per PostgreSQL batch write; parsed PDFs are lost if a run dies mid-batch
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
+
 
 def setup_logging(enable_logging: bool = False) -> str:
     """
@@ -40,16 +50,85 @@ def setup_logging(enable_logging: bool = False) -> str:
         return ''
 
 # Import pipeline stages
-from etenders_scraper import scrape_pages
+from etenders_scraper import scrape_pages, PageCache, PAGE_CACHE_FILE
 from type_coercer import coerce_types
 from pdf_parser import enrich_record_with_pdf
 from cpv_list_checker import check_cpv_codes
+from bid_analyzer import analyze_tender_for_bid
 
 # Import output handlers
 from json_output import JSONOutput
 from csv_output import CSVOutput
 from postgres_output import PostgresOutput
 
+# Output tables, each streamed to its own file for json/csv output
+OUTPUT_TABLES = ('tenders', 'pdfs', 'cpvs')
+
+
+def open_file_outputs(output_format: str, timestamp: str,
+                      base_filename: str = None) -> Dict[str, Any]:
+    """
+    Open one streaming file writer per output table.
+    
+    JSON output is newline-delimited (.jsonl) so each record is written as it
+    arrives and nothing is held in memory.
+    
+    Args:
+        output_format: 'json' or 'csv'
+        timestamp: Run timestamp included in each filename
+        base_filename: Filename prefix (extension ignored), 'etenders' if None
+        
+    Returns:
+        Dictionary of table name to JSONOutput/CSVOutput
+    """
+    base = os.path.splitext(base_filename)[0] if base_filename else 'etenders'
+    if output_format == 'csv':
+        return {table: CSVOutput(output_file=f'{base}_{table}_{timestamp}.csv')
+                for table in OUTPUT_TABLES}
+    return {table: JSONOutput(output_file=f'{base}_{table}_{timestamp}.jsonl', fmt='jsonl')
+            for table in OUTPUT_TABLES}
+
+
+def write_postgres_batch(output_handler: PostgresOutput, total_written: Dict[str, int],
+                         tender_records: list, pdf_records: list,
+                         cpv_records: list, bid_records: list) -> tuple[int, int, int, int]:
+    """
+    Write one batch of records to PostgreSQL and add its counts to the totals.
+    
+    Args:
+        output_handler: Open PostgresOutput
+        total_written: Running counts keyed 'tenders', 'pdfs', 'cpvs' and 'bids'
+        tender_records: Tender records in the batch
+        pdf_records: PDF records in the batch
+        cpv_records: CPV records in the batch
+        bid_records: Bid analyses in the batch
+        
+    Returns:
+        Tuple of (tender_count, pdf_count, cpv_count, bid_count) for the batch
+    """
+    result = output_handler.write_records(
+        tender_records=tender_records,
+        pdf_records=pdf_records,
+        cpv_records=cpv_records,
+        bid_records=bid_records  # Write bid analyses in same batch
+    )
+    for key, count in zip(('tenders', 'pdfs', 'cpvs', 'bids'), result):
+        total_written[key] += count
+    return result
+
+
+def flatten_pdf_content(pdf_record: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a pdf_content dict to a JSON string so it stays one CSV column."""
+    pdf_content = pdf_record.get('pdf_content')
+    if not isinstance(pdf_content, dict):
+        return pdf_record
+    try:
+        serialized = orjson.dumps(pdf_content, default=str).decode()
+    except TypeError:
+        # orjson rejects integers wider than 64 bits that json.loads accepted
+        serialized = json.dumps(pdf_content, default=str)
+    return {**pdf_record, 'pdf_content': serialized}
+
 
 def process_record(record: Dict[str, Any], 
                    process_pdfs: bool = True,
@@ -78,17 +157,18 @@ def process_record(record: Dict[str, Any],
     if process_pdfs and tender_record.get('has_pdf_url'):
         logger.debug(f"Processing PDF for tender {resource_id}")
         enriched = enrich_record_with_pdf(tender_record, debug=debug)
-        if enriched.get('pdf_parsed') and enriched.get('pdf_data'):
-            import json
-            pdf_data = enriched['pdf_data']
-            # Convert pdf_content dict to JSON string
-            pdf_content_str = json.dumps(pdf_data.get('pdf_content', {})) if isinstance(pdf_data.get('pdf_content'), dict) else str(pdf_data.get('pdf_content', ''))
+        pdf_data = enriched.get('pdf_data')
+        if pdf_data and enriched.get('pdf_parsed'):
+            # Sections dicts stay as-is; output handlers serialize them at write time
+            pdf_content = pdf_data.get('pdf_content', '')
+            if not isinstance(pdf_content, dict):
+                pdf_content = str(pdf_content)
             
             pdf_record = {
                 'resource_id': resource_id,
                 'pdf_url': tender_record.get('notice_pdf_url'),
                 'pdf_parsed': True,
-                'pdf_content': pdf_content_str
+                'pdf_content': pdf_content
             }
             logger.info(f"Successfully parsed PDF for tender {resource_id}")
         else:
@@ -98,26 +178,70 @@ def process_record(record: Dict[str, Any],
     # Use enriched record which has PDF data with CPV codes
     cpv_record = None
     if check_cpvs:
-        enriched_cpv = check_cpv_codes(enriched)
+        # The PDF-enriched record is a throwaway copy, but tender_record is returned
+        enriched_cpv = check_cpv_codes(enriched, in_place=enriched is not tender_record)
         cpv_count = enriched_cpv.get('cpv_count', 0)
         
         # Always create CPV record if any codes found (including validated IT codes)
         if cpv_count > 0:
+            cpv_details = enriched_cpv.get('cpv_codes', [])
             cpv_record = {
                 'resource_id': resource_id,
                 'cpv_count': cpv_count,
                 'cpv_codes': enriched_cpv.get('cpv_code_list', []),
-                'cpv_details': enriched_cpv.get('cpv_codes', []),
+                'cpv_details': cpv_details,
                 'has_validated_cpv': enriched_cpv.get('has_validated_cpv', False)
             }
-            validated_count = len([c for c in enriched_cpv.get('cpv_codes', []) if c.get('validated')])
-            logger.info(f"Found {cpv_count} CPV codes for tender {resource_id} ({validated_count} validated IT codes)")
+            # Logging is off by default, so only count validated codes when it is on
+            if logger.isEnabledFor(logging.INFO):
+                validated_count = sum(1 for c in cpv_details if c.get('validated'))
+                logger.info(f"Found {cpv_count} CPV codes for tender {resource_id} ({validated_count} validated IT codes)")
         else:
             logger.debug(f"No CPV codes found for tender {resource_id}")
     
     return tender_record, pdf_record, cpv_record
 
 
+def process_records(records: Iterable[Dict[str, Any]],
+                    max_workers: int = PROCESS_CONCURRENCY,
+                    **options) -> Generator[tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]], None, None]:
+    """
+    Run process_record over a record stream on a bounded thread pool.
+    
+    Results are yielded as records finish, so order is not preserved. Outputs
+    stay on the caller's thread.
+    
+    Args:
+        records: Raw tender records from the scraper
+        max_workers: Records processed at once (1 processes them in order)
+        **options: process_pdfs / check_cpvs / debug, passed to process_record
+        
+    Yields:
+        Tuple of (tender_record, pdf_record, cpv_record) per record
+    """
+    if max_workers <= 1:
+        for record in records:
+            yield process_record(record, **options)
+        return
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for record in records:
+            pending.add(executor.submit(process_record, record, **options))
+            
+            # Bound in-flight records so the scraper is not drained into memory
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        
+        # Drain remaining records
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
 def run_pipeline(start_page: int = 1,
                 end_page: int = 1,
                 output_format: str = 'json',
@@ -127,7 +251,9 @@ def run_pipeline(start_page: int = 1,
                 delay: float = 1.0,
                 debug: bool = False,
                 enable_logging: bool = False,
-                analyze_bids: bool = False) -> tuple[str, str, str, str]:
+                analyze_bids: bool = False,
+                page_cache: str = None,
+                max_workers: int = PROCESS_CONCURRENCY) -> tuple[str, str, str, str]:
     """
     Run the complete eTenders scraping and processing pipeline
     
@@ -138,9 +264,11 @@ def run_pipeline(start_page: int = 1,
         output_file: Base filename for output (auto-generated if None)
         process_pdfs: Whether to download and parse PDFs
         check_cpvs: Whether to check CPV codes
-        delay: Delay between requests in seconds
+        delay: Minimum seconds between page request starts (across all fetch workers)
         debug: Enable debug mode for LLM responses
         enable_logging: Enable logging to file and console
+        page_cache: Sidecar JSON file for conditional page requests (disabled if None)
+        max_workers: Records processed concurrently (PDF parsing and CPV checks)
         
     Returns:
         Tuple of (timestamp, tenders_output, pdfs_output, cpvs_output)
@@ -153,44 +281,51 @@ def run_pipeline(start_page: int = 1,
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # Initialize output handlers based on format
-    if output_format == 'postgres':
+    # Initialize output handlers based on format; the format is dispatched once here
+    is_postgres = output_format == 'postgres'
+    flatten_pdfs = output_format == 'csv'
+    analyze_inline = analyze_bids and is_postgres
+    file_outputs = None
+    if is_postgres:
         # PostgresOutput doesn't need table_name parameter
         output_handler = PostgresOutput()
         logger.info("Using PostgreSQL output")
-    elif output_format == 'csv':
-        output_handler = CSVOutput(timestamp=timestamp, base_filename=output_file)
-        logger.info(f"Using CSV output with timestamp: {timestamp}")
-    else:  # json
-        output_handler = JSONOutput(timestamp=timestamp, base_filename=output_file)
-        logger.info(f"Using JSON output with timestamp: {timestamp}")
+    else:
+        # JSON/CSV records are streamed straight to their files
+        file_outputs = open_file_outputs(output_format, timestamp, output_file)
+        logger.info(f"Using {output_format.upper()} output with timestamp: {timestamp}")
     
-    # Collect records
+    # Collect records for the next PostgreSQL batch
     tender_records = []
     pdf_records = []
     cpv_records = []
     bid_records = []
     
-    # Batch size for incremental writes (write every N records)
-    BATCH_SIZE = 10
     total_written = {'tenders': 0, 'pdfs': 0, 'cpvs': 0, 'bids': 0}
     
-    # Import bid analyzer if needed
-    if analyze_bids and output_format == 'postgres':
-        from bid_analyzer import analyze_tender_for_bid
-    
     logger.info(f"Starting scraping from page {start_page} to {end_page}")
     print(f"\nScraping eTenders pages {start_page} to {end_page}...")
     
     # Scrape and process records
-    for i, record in enumerate(scrape_pages(start_page=start_page, end_page=end_page, delay=delay), start=1):
-        # Process each record
-        tender_data, pdf_data, cpv_data = process_record(
-            record, 
-            process_pdfs=process_pdfs,
-            check_cpvs=check_cpvs,
-            debug=debug
-        )
+    cache = PageCache(page_cache) if page_cache else None
+    records = scrape_pages(start_page=start_page, end_page=end_page, delay=delay, cache=cache)
+    processed = process_records(
+        records,
+        max_workers=max_workers,
+        process_pdfs=process_pdfs,
+        check_cpvs=check_cpvs,
+        debug=debug
+    )
+    for tender_data, pdf_data, cpv_data in processed:
+        if file_outputs:
+            total_written['tenders'] += file_outputs['tenders'].write_record(tender_data)
+            if pdf_data:
+                if flatten_pdfs:
+                    pdf_data = flatten_pdf_content(pdf_data)
+                total_written['pdfs'] += file_outputs['pdfs'].write_record(pdf_data)
+            if cpv_data:
+                total_written['cpvs'] += file_outputs['cpvs'].write_record(cpv_data)
+            continue
         
         tender_records.append(tender_data)
         
@@ -201,7 +336,7 @@ def run_pipeline(start_page: int = 1,
             cpv_records.append(cpv_data)
         
         # Analyze bid immediately if enabled (before batching)
-        if analyze_bids and output_format == 'postgres' and pdf_data:
+        if analyze_inline and pdf_data:
             # Structure data to match bid_analyzer's expected format
             analysis_data = {
                 'resource_id': tender_data.get('resource_id'),
@@ -209,27 +344,17 @@ def run_pipeline(start_page: int = 1,
                 'pdf': pdf_data,
                 'cpv': cpv_data if cpv_data else {}
             }
-            bid_analysis = analyze_tender_for_bid(analysis_data)
+            bid_analysis = analyze_tender_for_bid(analysis_data, strictness='lenient')
             if bid_analysis:
                 bid_analysis['resource_id'] = tender_data.get('resource_id')
                 bid_records.append(bid_analysis)
                 logger.info(f"Analyzed bid for {tender_data.get('resource_id')}")
         
         # Write in batches for postgres output
-        if output_format == 'postgres' and i % BATCH_SIZE == 0:
+        if len(tender_records) >= BATCH_SIZE:
             logger.info(f"Writing batch of {len(tender_records)} records to database...")
-            result = output_handler.write_records(
-                tender_records=tender_records,
-                pdf_records=pdf_records,
-                cpv_records=cpv_records,
-                bid_records=bid_records  # Write bid analyses in same batch
-            )
-            batch_tenders, batch_pdfs, batch_cpvs, batch_bids = result
-            total_written['tenders'] += batch_tenders
-            total_written['pdfs'] += batch_pdfs
-            total_written['cpvs'] += batch_cpvs
-            total_written['bids'] += batch_bids
-            
+            batch_tenders, batch_pdfs, batch_cpvs, batch_bids = write_postgres_batch(
+                output_handler, total_written, tender_records, pdf_records, cpv_records, bid_records)
             print(f"✓ Wrote batch: {batch_tenders} tenders, {batch_pdfs} PDFs, {batch_cpvs} CPVs, {batch_bids} bid analyses (total: {total_written['tenders']} tenders)")
             
             # Clear batch
@@ -238,29 +363,20 @@ def run_pipeline(start_page: int = 1,
             cpv_records = []
             bid_records = []
     
-    # Write any remaining records
-    if output_format == 'postgres' and tender_records:
+    # Write any remaining records (only PostgreSQL batches are buffered)
+    if tender_records:
         logger.info(f"Writing final batch of {len(tender_records)} records...")
-        result = output_handler.write_records(
-            tender_records=tender_records,
-            pdf_records=pdf_records,
-            cpv_records=cpv_records,
-            bid_records=bid_records
-        )
-        batch_tenders, batch_pdfs, batch_cpvs, batch_bids = result
-        total_written['tenders'] += batch_tenders
-        total_written['pdfs'] += batch_pdfs
-        total_written['cpvs'] += batch_cpvs
-        total_written['bids'] += batch_bids
+        batch_tenders, batch_pdfs, batch_cpvs, batch_bids = write_postgres_batch(
+            output_handler, total_written, tender_records, pdf_records, cpv_records, bid_records)
         print(f"✓ Wrote final batch: {batch_tenders} tenders, {batch_pdfs} PDFs, {batch_cpvs} CPVs, {batch_bids} bid analyses")
     
-    logger.info(f"Scraped {total_written.get('tenders', len(tender_records))} tender records")
-    print(f"\n✓ Total scraped: {total_written.get('tenders', len(tender_records))} tenders")
-    if analyze_bids and output_format == 'postgres':
+    logger.info(f"Scraped {total_written['tenders']} tender records")
+    print(f"\n✓ Total scraped: {total_written['tenders']} tenders")
+    if analyze_inline:
         print(f"✓ Total analyzed: {total_written.get('bids', 0)} bids")
     
     # Final summary
-    if output_format == 'postgres':
+    if is_postgres:
         output_handler.close()
         
         logger.info(f"PostgreSQL write complete: {total_written['tenders']} tenders, {total_written['pdfs']} PDFs, {total_written['cpvs']} CPVs")
@@ -272,10 +388,10 @@ def run_pipeline(start_page: int = 1,
         return timestamp, total_written['tenders'], total_written['pdfs'], total_written['cpvs']
     
     else:
-        # CSV or JSON output - write all at once at the end
-        tenders_file = output_handler.write_tenders(tender_records)
-        pdfs_file = output_handler.write_pdfs(pdf_records)
-        cpvs_file = output_handler.write_cpvs(cpv_records)
+        # CSV or JSON output - close the streamed files
+        for output in file_outputs.values():
+            output.flush()
+        tenders_file, pdfs_file, cpvs_file = (file_outputs[table].output_file for table in OUTPUT_TABLES)
         
         logger.info(f"Files written: {tenders_file}, {pdfs_file}, {cpvs_file}")
         print(f"\n✓ Output files created:")
@@ -296,19 +412,23 @@ if __name__ == "__main__":
     parser.add_argument('--output', type=str, choices=['json', 'csv', 'postgres'], default='json',
                        help='Output format (default: json)')
     parser.add_argument('--output-file', type=str,
-                       help='Output file path (for json/csv only)')
+                       help='Output filename prefix for json/csv; table name and timestamp are appended')
     parser.add_argument('--no-pdfs', action='store_true',
                        help='Disable PDF processing')
     parser.add_argument('--no-cpvs', action='store_true',
                        help='Disable CPV code checking')
     parser.add_argument('--delay', type=float, default=1.0,
-                       help='Delay between page requests in seconds (default: 1.0)')
+                       help='Minimum seconds between page request starts, across all fetch workers (default: 1.0)')
     parser.add_argument('--analyze-bids', action='store_true',
                        help='Run AI bid analysis after scraping')
     parser.add_argument('--debug', action='store_true',
                        help='Enable debug mode - saves problematic Ollama responses to files')
     parser.add_argument('--enable-logging', action='store_true',
                        help='Enable logging to file and console (default: disabled)')
+    parser.add_argument('--workers', type=int, default=PROCESS_CONCURRENCY,
+                       help=f'Records processed concurrently (default: {PROCESS_CONCURRENCY})')
+    parser.add_argument('--page-cache', type=str, nargs='?', const=PAGE_CACHE_FILE,
+                       help=f'Skip unchanged pages via conditional requests, caching rows in this JSON file (default: {PAGE_CACHE_FILE})')
     
     args = parser.parse_args()
     
@@ -327,7 +447,9 @@ if __name__ == "__main__":
         debug=args.debug,
         delay=args.delay,
         enable_logging=args.enable_logging,
-        analyze_bids=args.analyze_bids
+        analyze_bids=args.analyze_bids,
+        page_cache=args.page_cache,
+        max_workers=args.workers
     )
     
     # Note: Bid analysis now runs inline during scraping when --analyze-bids is set
@@ -5,6 +5,7 @@ Accepts a tender record, extracts PDF text if URL exists, parses with local Olla
 
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO
 from pdfminer.high_level import extract_text
 import json
@@ -18,6 +19,17 @@ logger = logging.getLogger(__name__)
 # Initialize error log file
 PDF_ERROR_LOG = 'pdf_parser_errors.log'
 
+# Shared keep-alive pool for PDF downloads and Ollama calls from concurrent records
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# Markdown fences stripped from Ollama responses, and the outermost JSON object
+_JSON_FENCE_HEAD = re.compile(r'^```json\s*\n')
+_JSON_FENCE_TAIL = re.compile(r'\n```\s*$')
+_FENCE_HEAD = re.compile(r'^```\s*\n')
+_JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
 
 def log_error(message: str):
     """Write error message to log file and print to console."""
@@ -45,7 +57,7 @@ def extract_pdf_text(pdf_url: str) -> str:
     """
     try:
         logger.info(f"Downloading PDF from: {pdf_url}")
-        response = requests.get(pdf_url, timeout=30)
+        response = _SESSION.get(pdf_url, timeout=30)
         response.raise_for_status()
         
         pdf_size = len(response.content)
@@ -125,7 +137,7 @@ PDF Text:
         
         while retry_count <= max_retries:
             try:
-                response = requests.post(
+                response = _SESSION.post(
                     'http://localhost:11434/api/generate',
                     json={
                         'model': model,
@@ -156,9 +168,9 @@ PDF Text:
         
         # Parse JSON from response
         # Remove markdown code blocks if present
-        json_text = re.sub(r'^```json\s*\n', '', response_text)
-        json_text = re.sub(r'\n```\s*$', '', json_text)
-        json_text = re.sub(r'^```\s*\n', '', json_text)
+        json_text = _JSON_FENCE_HEAD.sub('', response_text)
+        json_text = _JSON_FENCE_TAIL.sub('', json_text)
+        json_text = _FENCE_HEAD.sub('', json_text)
         json_text = json_text.strip()
         
         try:
@@ -190,7 +202,7 @@ PDF Text:
             json_text_fixed = json_text.replace("'", '"')
             
             # 2. Try to extract just the JSON object if there's extra text
-            json_match = re.search(r'\{.*\}', json_text_fixed, re.DOTALL)
+            json_match = _JSON_OBJECT.search(json_text_fixed)
             if json_match:
                 json_text_fixed = json_match.group(0)
                 try:
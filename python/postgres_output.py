@@ -4,17 +4,161 @@ Writes to PostgreSQL database with proper table relationships
 """
 
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
+import json
 import logging
+import orjson
 import os
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Rows per multi-row INSERT statement sent by execute_values
+PAGE_SIZE = 1000
+
+TENDER_UPSERT = """
+    INSERT INTO etenders_core (
+        resource_id, row_number, title, detail_url, contracting_authority,
+        info, date_published, submission_deadline, procedure, status,
+        notice_pdf_url, award_date, estimated_value, cycle,
+        date_published_parsed, submission_deadline_parsed, award_date_parsed,
+        estimated_value_numeric, cycle_numeric, has_pdf_url,
+        has_estimated_value, is_open
+    ) VALUES %s
+    ON CONFLICT (resource_id) DO UPDATE SET
+        row_number = EXCLUDED.row_number,
+        title = EXCLUDED.title,
+        detail_url = EXCLUDED.detail_url,
+        contracting_authority = EXCLUDED.contracting_authority,
+        info = EXCLUDED.info,
+        date_published = EXCLUDED.date_published,
+        submission_deadline = EXCLUDED.submission_deadline,
+        procedure = EXCLUDED.procedure,
+        status = EXCLUDED.status,
+        notice_pdf_url = EXCLUDED.notice_pdf_url,
+        award_date = EXCLUDED.award_date,
+        estimated_value = EXCLUDED.estimated_value,
+        cycle = EXCLUDED.cycle,
+        date_published_parsed = EXCLUDED.date_published_parsed,
+        submission_deadline_parsed = EXCLUDED.submission_deadline_parsed,
+        award_date_parsed = EXCLUDED.award_date_parsed,
+        estimated_value_numeric = EXCLUDED.estimated_value_numeric,
+        cycle_numeric = EXCLUDED.cycle_numeric,
+        has_pdf_url = EXCLUDED.has_pdf_url,
+        has_estimated_value = EXCLUDED.has_estimated_value,
+        is_open = EXCLUDED.is_open,
+        updated_at = CURRENT_TIMESTAMP
+"""
+TENDER_TEMPLATE = """(
+    %(resource_id)s, %(row_number)s, %(title)s, %(detail_url)s, %(contracting_authority)s,
+    %(info)s, %(date_published)s, %(submission_deadline)s, %(procedure)s, %(status)s,
+    %(notice_pdf_url)s, %(award_date)s, %(estimated_value)s, %(cycle)s,
+    %(date_published_parsed)s, %(submission_deadline_parsed)s, %(award_date_parsed)s,
+    %(estimated_value_numeric)s, %(cycle_numeric)s, %(has_pdf_url)s,
+    %(has_estimated_value)s, %(is_open)s
+)"""
+
+PDF_UPSERT = """
+    INSERT INTO etenders_pdf (
+        resource_id, pdf_url, pdf_parsed, pdf_content
+    ) VALUES %s
+    ON CONFLICT (resource_id) DO UPDATE SET
+        pdf_url = EXCLUDED.pdf_url,
+        pdf_parsed = EXCLUDED.pdf_parsed,
+        pdf_content = EXCLUDED.pdf_content,
+        updated_at = CURRENT_TIMESTAMP
+"""
+PDF_TEMPLATE = "(%(resource_id)s, %(pdf_url)s, %(pdf_parsed)s, %(pdf_content)s)"
+
+CPV_UPSERT = """
+    INSERT INTO cpv_checker (
+        resource_id, cpv_count, cpv_codes, cpv_details, has_validated_cpv
+    ) VALUES %s
+    ON CONFLICT (resource_id) DO UPDATE SET
+        cpv_count = EXCLUDED.cpv_count,
+        cpv_codes = EXCLUDED.cpv_codes,
+        cpv_details = EXCLUDED.cpv_details,
+        has_validated_cpv = EXCLUDED.has_validated_cpv
+"""
+CPV_TEMPLATE = "(%(resource_id)s, %(cpv_count)s, %(cpv_codes)s, %(cpv_details)s, %(has_validated_cpv)s)"
+
+BID_UPSERT = """
+    INSERT INTO bid_analysis (
+        resource_id, should_bid, confidence, reasoning, 
+        relevant_factors, estimated_fit, analyzed_at
+    ) VALUES %s
+    ON CONFLICT (resource_id) DO UPDATE SET
+        should_bid = EXCLUDED.should_bid,
+        confidence = EXCLUDED.confidence,
+        reasoning = EXCLUDED.reasoning,
+        relevant_factors = EXCLUDED.relevant_factors,
+        estimated_fit = EXCLUDED.estimated_fit,
+        analyzed_at = EXCLUDED.analyzed_at,
+        updated_at = CURRENT_TIMESTAMP
+"""
+BID_TEMPLATE = """(
+    %(resource_id)s, %(should_bid)s, %(confidence)s, %(reasoning)s,
+    %(relevant_factors)s, %(estimated_fit)s, %(analyzed_at)s
+)"""
+
+
+def _json_dumps(obj: Any) -> str:
+    """Serialize JSON parameters with orjson, falling back to json for values it rejects (e.g. huge ints)."""
+    try:
+        return orjson.dumps(obj).decode()
+    except TypeError:
+        return json.dumps(obj, default=str)
+
+
+def _pdf_params(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract only the etenders_pdf columns from a PDF record, serializing pdf_content dicts."""
+    pdf_content = record.get('pdf_content', '')
+    return {
+        'resource_id': record.get('resource_id'),
+        'pdf_url': record.get('pdf_url'),
+        'pdf_parsed': record.get('pdf_parsed', False),
+        'pdf_content': _json_dumps(pdf_content) if isinstance(pdf_content, dict) else pdf_content
+    }
+
+
+def _cpv_params(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Build cpv_checker parameters, wrapping lists/dicts for the JSONB columns."""
+    return {
+        'resource_id': record.get('resource_id'),
+        'cpv_count': record.get('cpv_count', 0),
+        'cpv_codes': Json(record.get('cpv_codes', []), dumps=_json_dumps),
+        'cpv_details': Json(record.get('cpv_details', {}), dumps=_json_dumps),
+        'has_validated_cpv': record.get('has_validated_cpv', False)
+    }
+
+
+def _build_params(build: Callable[[Dict[str, Any]], Dict[str, Any]],
+                  records: List[Dict[str, Any]], label: str) -> List[Dict[str, Any]]:
+    """
+    Build query parameters per record, dropping only records that fail
+    
+    Args:
+        build: Parameter builder such as _pdf_params
+        records: Records to convert (empty entries are skipped)
+        label: Record type used in log messages
+        
+    Returns:
+        Parameter dictionaries for the records that converted
+    """
+    rows = []
+    for record in records:
+        if not record:
+            continue
+        try:
+            rows.append(build(record))
+        except Exception as e:
+            logger.error(f"Error preparing {label} record {record.get('resource_id')}: {e}")
+    return rows
+
 
 class PostgresOutput:
     """Handle writing records to PostgreSQL database"""
@@ -45,66 +189,51 @@ class PostgresOutput:
         """Return the database connection object"""
         return self.conn
     
-    def write_tender(self, record: Dict[str, Any]) -> bool:
+    def _upsert(self, query: str, template: str, rows: List[Dict[str, Any]], label: str) -> int:
         """
-        Write tender record to etenders_core table
+        Upsert rows with one multi-row INSERT and a single commit
+        
+        If the batch fails, rows are retried one at a time so a single bad
+        record does not discard the rest of the batch.
         
         Args:
-            record: Tender data dictionary
+            query: INSERT ... VALUES %s ... statement
+            template: Per-row VALUES template with named placeholders
+            rows: Parameter dictionaries
+            label: Record type used in log messages
             
         Returns:
-            True if successful, False otherwise
+            Number of rows written
         """
+        if not rows:
+            return 0
+        
+        # ON CONFLICT cannot update the same row twice in one statement; keep the latest
+        rows = list({row.get('resource_id'): row for row in rows}.values())
+        
         try:
-            query = """
-                INSERT INTO etenders_core (
-                    resource_id, row_number, title, detail_url, contracting_authority,
-                    info, date_published, submission_deadline, procedure, status,
-                    notice_pdf_url, award_date, estimated_value, cycle,
-                    date_published_parsed, submission_deadline_parsed, award_date_parsed,
-                    estimated_value_numeric, cycle_numeric, has_pdf_url,
-                    has_estimated_value, is_open
-                ) VALUES (
-                    %(resource_id)s, %(row_number)s, %(title)s, %(detail_url)s, %(contracting_authority)s,
-                    %(info)s, %(date_published)s, %(submission_deadline)s, %(procedure)s, %(status)s,
-                    %(notice_pdf_url)s, %(award_date)s, %(estimated_value)s, %(cycle)s,
-                    %(date_published_parsed)s, %(submission_deadline_parsed)s, %(award_date_parsed)s,
-                    %(estimated_value_numeric)s, %(cycle_numeric)s, %(has_pdf_url)s,
-                    %(has_estimated_value)s, %(is_open)s
-                )
-                ON CONFLICT (resource_id) DO UPDATE SET
-                    row_number = EXCLUDED.row_number,
-                    title = EXCLUDED.title,
-                    detail_url = EXCLUDED.detail_url,
-                    contracting_authority = EXCLUDED.contracting_authority,
-                    info = EXCLUDED.info,
-                    date_published = EXCLUDED.date_published,
-                    submission_deadline = EXCLUDED.submission_deadline,
-                    procedure = EXCLUDED.procedure,
-                    status = EXCLUDED.status,
-                    notice_pdf_url = EXCLUDED.notice_pdf_url,
-                    award_date = EXCLUDED.award_date,
-                    estimated_value = EXCLUDED.estimated_value,
-                    cycle = EXCLUDED.cycle,
-                    date_published_parsed = EXCLUDED.date_published_parsed,
-                    submission_deadline_parsed = EXCLUDED.submission_deadline_parsed,
-                    award_date_parsed = EXCLUDED.award_date_parsed,
-                    estimated_value_numeric = EXCLUDED.estimated_value_numeric,
-                    cycle_numeric = EXCLUDED.cycle_numeric,
-                    has_pdf_url = EXCLUDED.has_pdf_url,
-                    has_estimated_value = EXCLUDED.has_estimated_value,
-                    is_open = EXCLUDED.is_open,
-                    updated_at = CURRENT_TIMESTAMP
-            """
-            
-            self.cursor.execute(query, record)
+            execute_values(self.cursor, query, rows, template=template, page_size=PAGE_SIZE)
             self.conn.commit()
-            return True
-            
+            return len(rows)
         except Exception as e:
-            logger.error(f"Error writing tender record: {e}")
             self.conn.rollback()
-            return False
+            if len(rows) == 1:
+                logger.error(f"Error writing {label} record: {e}")
+                return 0
+            logger.warning(f"Batch {label} write failed, retrying row by row: {e}")
+            return sum(self._upsert(query, template, [row], label) for row in rows)
+    
+    def write_tender(self, record: Dict[str, Any]) -> bool:
+        """
+        Write tender record to etenders_core table
+        
+        Args:
+            record: Tender data dictionary
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return self._upsert(TENDER_UPSERT, TENDER_TEMPLATE, [record], 'tender') == 1
     
     def write_pdf(self, record: Dict[str, Any]) -> bool:
         """
@@ -116,36 +245,7 @@ class PostgresOutput:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # Extract only the fields we need, handle pdf_content specially
-            pdf_data = {
-                'resource_id': record.get('resource_id'),
-                'pdf_url': record.get('pdf_url'),
-                'pdf_parsed': record.get('pdf_parsed', False),
-                'pdf_content': record.get('pdf_content', '')
-            }
-            
-            query = """
-                INSERT INTO etenders_pdf (
-                    resource_id, pdf_url, pdf_parsed, pdf_content
-                ) VALUES (
-                    %(resource_id)s, %(pdf_url)s, %(pdf_parsed)s, %(pdf_content)s
-                )
-                ON CONFLICT (resource_id) DO UPDATE SET
-                    pdf_url = EXCLUDED.pdf_url,
-                    pdf_parsed = EXCLUDED.pdf_parsed,
-                    pdf_content = EXCLUDED.pdf_content,
-                    updated_at = CURRENT_TIMESTAMP
-            """
-            
-            self.cursor.execute(query, pdf_data)
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error writing PDF record: {e}")
-            self.conn.rollback()
-            return False
+        return self._upsert(PDF_UPSERT, PDF_TEMPLATE, _build_params(_pdf_params, [record], 'PDF'), 'PDF') == 1
     
     def write_cpv(self, record: Dict[str, Any]) -> bool:
         """
@@ -157,40 +257,7 @@ class PostgresOutput:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # Convert lists/dicts to JSON for JSONB columns
-            cpv_codes = Json(record.get('cpv_codes', []))
-            cpv_details = Json(record.get('cpv_details', {}))
-            
-            query = """
-                INSERT INTO cpv_checker (
-                    resource_id, cpv_count, cpv_codes, cpv_details, has_validated_cpv
-                ) VALUES (
-                    %(resource_id)s, %(cpv_count)s, %(cpv_codes)s, %(cpv_details)s, %(has_validated_cpv)s
-                )
-                ON CONFLICT (resource_id) DO UPDATE SET
-                    cpv_count = EXCLUDED.cpv_count,
-                    cpv_codes = EXCLUDED.cpv_codes,
-                    cpv_details = EXCLUDED.cpv_details,
-                    has_validated_cpv = EXCLUDED.has_validated_cpv
-            """
-            
-            params = {
-                'resource_id': record.get('resource_id'),
-                'cpv_count': record.get('cpv_count', 0),
-                'cpv_codes': cpv_codes,
-                'cpv_details': cpv_details,
-                'has_validated_cpv': record.get('has_validated_cpv', False)
-            }
-            
-            self.cursor.execute(query, params)
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error writing CPV record: {e}")
-            self.conn.rollback()
-            return False
+        return self._upsert(CPV_UPSERT, CPV_TEMPLATE, _build_params(_cpv_params, [record], 'CPV'), 'CPV') == 1
     
     def write_bid_analysis(self, record: Dict[str, Any]) -> bool:
         """
@@ -202,42 +269,19 @@ class PostgresOutput:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            query = """
-                INSERT INTO bid_analysis (
-                    resource_id, should_bid, confidence, reasoning, 
-                    relevant_factors, estimated_fit, analyzed_at
-                ) VALUES (
-                    %(resource_id)s, %(should_bid)s, %(confidence)s, %(reasoning)s,
-                    %(relevant_factors)s, %(estimated_fit)s, %(analyzed_at)s
-                )
-                ON CONFLICT (resource_id) DO UPDATE SET
-                    should_bid = EXCLUDED.should_bid,
-                    confidence = EXCLUDED.confidence,
-                    reasoning = EXCLUDED.reasoning,
-                    relevant_factors = EXCLUDED.relevant_factors,
-                    estimated_fit = EXCLUDED.estimated_fit,
-                    analyzed_at = EXCLUDED.analyzed_at,
-                    updated_at = CURRENT_TIMESTAMP
-            """
-            
-            self.cursor.execute(query, record)
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error writing bid analysis: {e}")
-            self.conn.rollback()
-            return False
+        return self._upsert(BID_UPSERT, BID_TEMPLATE, [record], 'bid analysis') == 1
     
     def write_records(self, 
                      tender_records: List[Dict[str, Any]], 
                      pdf_records: List[Dict[str, Any]], 
                      cpv_records: List[Dict[str, Any]],
-                     bid_records: List[Dict[str, Any]] = None) -> tuple[str, str, str, str]:
+                     bid_records: List[Dict[str, Any]] = None) -> tuple[int, int, int, int]:
         """
         Write all records to their respective tables
         
+        Each table is written with one multi-row upsert per batch rather than
+        one INSERT and commit per record.
+        
         Args:
             tender_records: List of tender records
             pdf_records: List of PDF records
@@ -245,43 +289,23 @@ class PostgresOutput:
             bid_records: Optional list of bid analysis records
             
         Returns:
-            Tuple of (tender_count, pdf_count, cpv_count, bid_count) as strings
+            Tuple of (tender_count, pdf_count, cpv_count, bid_count)
         """
-        tender_count = 0
-        pdf_count = 0
-        cpv_count = 0
-        bid_count = 0
-        
-        # Write tender records
-        for record in tender_records:
-            if self.write_tender(record):
-                tender_count += 1
-        
+        # Tenders first: the other tables reference etenders_core
+        tender_count = self._upsert(TENDER_UPSERT, TENDER_TEMPLATE, tender_records, 'tender')
         logger.info(f"Wrote {tender_count}/{len(tender_records)} tender records")
         
-        # Write PDF records
-        for record in pdf_records:
-            if record:  # Skip empty records
-                if self.write_pdf(record):
-                    pdf_count += 1
-        
+        pdf_rows = _build_params(_pdf_params, pdf_records, 'PDF')
+        pdf_count = self._upsert(PDF_UPSERT, PDF_TEMPLATE, pdf_rows, 'PDF')
         logger.info(f"Wrote {pdf_count}/{len(pdf_records)} PDF records")
         
-        # Write CPV records
-        for record in cpv_records:
-            if record:  # Skip empty records
-                if self.write_cpv(record):
-                    cpv_count += 1
-        
+        cpv_rows = _build_params(_cpv_params, cpv_records, 'CPV')
+        cpv_count = self._upsert(CPV_UPSERT, CPV_TEMPLATE, cpv_rows, 'CPV')
         logger.info(f"Wrote {cpv_count}/{len(cpv_records)} CPV records")
         
-        # Write bid analysis records if provided
+        bid_count = 0
         if bid_records:
-            for record in bid_records:
-                if record:
-                    if self.write_bid_analysis(record):
-                        bid_count += 1
-            
+            bid_count = self._upsert(BID_UPSERT, BID_TEMPLATE, [r for r in bid_records if r], 'bid analysis')
             logger.info(f"Wrote {bid_count}/{len(bid_records)} bid analysis records")
         
         return (tender_count, pdf_count, cpv_count, bid_count)
@@ -6,6 +6,8 @@ Tests data ingestion, schema validation, and pipeline integrity
 import unittest
 import json
 import os
+import shutil
+import tempfile
 from datetime import datetime
 from unittest.mock import patch, MagicMock
 import pandas as pd
@@ -197,6 +199,16 @@ class TestCPVValidation(unittest.TestCase):
                 cpv_data = json.load(f)
                 self.assertIsInstance(cpv_data, (list, dict))
 
+    def test_cpv_boundaries_match_across_backends(self):
+        """Test that Unicode word characters bound codes the same with and without Aho-Corasick"""
+        import cpv_list_checker
+        text = 'é48100000 48100000 a48100000 481000001 48100000_ (48100000)'
+        with_automaton = cpv_list_checker.find_known_cpv_codes(text)
+        with patch.object(cpv_list_checker, 'CPV_AUTOMATON', None):
+            without_automaton = cpv_list_checker.find_known_cpv_codes(text)
+        self.assertEqual(with_automaton, ['48100000', '48100000'])
+        self.assertEqual(without_automaton, with_automaton)
+
 
 class TestSchemaValidation(unittest.TestCase):
     """Test database schema validation"""
@@ -330,6 +342,199 @@ class TestDataIntegrity(unittest.TestCase):
             self.assertLessEqual(score, 1.0)
 
 
+class TestPostgresBatchWrites(unittest.TestCase):
+    """Test multi-row upserts in PostgresOutput"""
+    
+    def setUp(self):
+        """Create an output handler without a database connection"""
+        from postgres_output import PostgresOutput
+        self.output = PostgresOutput.__new__(PostgresOutput)
+        self.output.conn = MagicMock()
+        self.output.cursor = MagicMock()
+    
+    def test_batch_deduplicates_resource_ids(self):
+        """Test that a batch keeps only the latest row per resource_id"""
+        rows = [
+            {'resource_id': '1', 'title': 'old'},
+            {'resource_id': '2', 'title': 'B'},
+            {'resource_id': '1', 'title': 'new'}
+        ]
+        with patch('postgres_output.execute_values') as mock_execute:
+            written = self.output._upsert('QUERY', 'TEMPLATE', rows, 'tender')
+        
+        self.assertEqual(written, 2)
+        mock_execute.assert_called_once()
+        sent = mock_execute.call_args[0][2]
+        self.assertEqual([row['title'] for row in sent], ['new', 'B'])
+        self.output.conn.commit.assert_called_once()
+    
+    def test_failed_batch_retries_row_by_row(self):
+        """Test that one bad row only loses itself"""
+        def execute(cursor, query, rows, **kwargs):
+            if any(row['resource_id'] == 'bad' for row in rows):
+                raise ValueError('bad row')
+        
+        rows = [{'resource_id': '1'}, {'resource_id': 'bad'}, {'resource_id': '3'}]
+        with patch('postgres_output.execute_values', side_effect=execute) as mock_execute:
+            written = self.output._upsert('QUERY', 'TEMPLATE', rows, 'tender')
+        
+        self.assertEqual(written, 2)
+        # One batch attempt, then one attempt per row
+        self.assertEqual(mock_execute.call_count, 4)
+        self.assertEqual(self.output.conn.rollback.call_count, 2)
+    
+    def test_pdf_content_with_huge_int_is_serialized(self):
+        """Test that PDF content orjson rejects still serializes via json"""
+        from postgres_output import _pdf_params
+        content = json.loads('{"reference": 123456789012345678901234}')
+        params = _pdf_params({'resource_id': '1', 'pdf_content': content})
+        self.assertEqual(json.loads(params['pdf_content']), content)
+
+
+class TestCSVFlattening(unittest.TestCase):
+    """Test CSVOutput's cached flatten plan"""
+    
+    def setUp(self):
+        """Create a buffered (non-streaming) CSV output"""
+        from csv_output import CSVOutput
+        self.output = CSVOutput(output_file=os.devnull, streaming=False)
+    
+    def test_cached_plan_matches_flatten_record(self):
+        """Test that plan-based flattening matches the reference flattener"""
+        records = [
+            {'id': 1, 'pdf': {'url': 'a', 'meta': {'pages': 2}}, 'codes': ['1', '2']},
+            {'id': 2, 'pdf': {'url': 'b', 'meta': {'pages': 5}}, 'codes': []},
+            # Shape change forces a plan rebuild
+            {'id': 3, 'pdf': {'url': 'c', 'extra': True}, 'codes': ['3']},
+            {'id': 4, 'pdf': {'url': 'd', 'meta': 'not a dict'}, 'codes': None},
+            {'id': 5, 'flat': 'value'}
+        ]
+        for record in records:
+            self.assertEqual(self.output._flatten_cached(record), self.output._flatten_record(record))
+
+    def test_streaming_skips_unwritable_row_once(self):
+        """Test that a row failing mid-batch is logged and no row is written twice"""
+        import csv
+        from csv_output import CSVOutput
+
+        class Unprintable:
+            def __str__(self):
+                raise ValueError('cannot render')
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'out.csv')
+            output = CSVOutput(output_file=path, log_file=os.path.join(tmpdir, 'errors.log'))
+            with patch('csv_output.ROW_BATCH_SIZE', 2):
+                for i, value in enumerate(['a', Unprintable(), 'c', 'd', 'e']):
+                    output.write_record({'id': i, 'value': value})
+            output.flush()
+
+            with open(path, encoding='utf-8', newline='') as f:
+                ids = [row['id'] for row in csv.DictReader(f)]
+            self.assertEqual(ids, ['0', '2', '3', '4'])
+            self.assertEqual(output.get_stats()['records_written'], 4)
+            self.assertEqual(output.get_stats()['errors'], 1)
+            self.assertIsNone(output.log_handle)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestBidPrefilter(unittest.TestCase):
+    """Test rule-based bid decisions that skip the LLM"""
+    
+    def setUp(self):
+        """Import the prefilter under test"""
+        from bid_analyzer import prefilter_tender
+        self.prefilter = prefilter_tender
+    
+    def test_validated_it_tender_is_recommended(self):
+        """Test validated IT CPV plus IT title keyword"""
+        result = self.prefilter('Cloud hosting services', ['72000000'], True)
+        self.assertTrue(result['should_bid'])
+    
+    def test_ambiguous_tender_goes_to_llm(self):
+        """Test that a single IT signal is left to the LLM"""
+        self.assertIsNone(self.prefilter('Consultancy services', ['72000000'], True))
+        self.assertIsNone(self.prefilter('Software for canteen ordering', [], False))
+        self.assertIsNone(self.prefilter('Consultancy services', [], False))
+    
+    def test_non_it_tender_is_rejected(self):
+        """Test rejection by title keyword or excluded CPV divisions"""
+        self.assertFalse(self.prefilter('School canteen catering', [], False)['should_bid'])
+        self.assertFalse(self.prefilter('Road resurfacing', ['45233000', '45000000'], False)['should_bid'])
+        self.assertIsNone(self.prefilter('Road resurfacing', ['45233000', '79000000'], False))
+
+    def test_generic_words_are_not_it_signals(self):
+        """Test that the pronoun 'it' and generic words don't block a rejection"""
+        self.assertFalse(self.prefilter('Keep it clean: office cleaning', [], False)['should_bid'])
+        self.assertFalse(self.prefilter('Catering system for canteen', [], False)['should_bid'])
+        self.assertTrue(self.prefilter('Supply of IT equipment', ['30200000'], True)['should_bid'])
+
+    def test_malformed_record_returns_error_result(self):
+        """Test that a malformed record yields an error result instead of raising"""
+        from bid_analyzer import analyze_tender_for_bid
+        result = analyze_tender_for_bid({'resource_id': 9, 'tender': 'not a dict'})
+        self.assertTrue(result['error'])
+        self.assertEqual(result['resource_id'], 9)
+        self.assertFalse(result['should_bid'])
+
+
+class TestJSONLRoundTrip(unittest.TestCase):
+    """Test JSON Lines output reloading through data_combiner"""
+    
+    def setUp(self):
+        """Create a scratch directory for output files"""
+        self.tmpdir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def _write(self, name, records):
+        from json_output import JSONOutput
+        path = os.path.join(self.tmpdir, f'{name}.jsonl')
+        output = JSONOutput(output_file=path, log_file=os.path.join(self.tmpdir, 'errors.log'), fmt='jsonl')
+        for record in records:
+            output.write_record(record)
+        output.flush()
+        return path
+    
+    def test_jsonl_outputs_join_by_resource_id(self):
+        """Test that tender/PDF/CPV JSONL files combine into one record per tender"""
+        from data_combiner import load_json_data
+        tenders = self._write('tenders', [
+            {'resource_id': 1, 'title': 'A'},
+            {'resource_id': 2, 'title': 'B'}
+        ])
+        pdfs = self._write('pdfs', [{'resource_id': 1, 'pdf_content': {'scope': 'software'}}])
+        cpvs = self._write('cpvs', [{'resource_id': 2, 'cpv_codes': ['72000000'], 'cpv_count': 1}])
+        
+        combined = {r['resource_id']: r for r in load_json_data(tenders, pdfs, cpvs)}
+        
+        self.assertEqual(set(combined), {1, 2})
+        self.assertEqual(combined[1]['tender']['title'], 'A')
+        self.assertEqual(combined[1]['pdf']['pdf_content'], {'scope': 'software'})
+        self.assertEqual(combined[2]['cpv']['cpv_codes'], ['72000000'])
+
+    def test_csv_multiline_cells_load_unchanged(self):
+        """Test that multi-line pdf_content and ISO timestamps survive CSV loading"""
+        import csv
+        from data_combiner import _load_csv_records
+        path = os.path.join(self.tmpdir, 'pdfs.csv')
+        content = 'Scope:\nSoftware support\n\n"Lot 2", hosting'
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['resource_id', 'pdf_content', 'processed_at'])
+            writer.writeheader()
+            writer.writerow({'resource_id': 7, 'pdf_content': content, 'processed_at': '2025-11-28T12:59:27'})
+
+        records = _load_csv_records(path)
+
+        self.assertEqual(list(records), [7])
+        self.assertEqual(records[7]['pdf_content'], content)
+        self.assertEqual(records[7]['processed_at'], '2025-11-28T12:59:27')
+        self.assertEqual(_load_csv_records(path, ['pdf_content'])[7], {'resource_id': '7', 'pdf_content': content})
+
+
 def run_tests_with_output():
     """Run tests and generate detailed report"""
     loader = unittest.TestLoader()
@@ -342,7 +547,11 @@ def run_tests_with_output():
         TestPDFValidation,
         TestCPVValidation,
         TestSchemaValidation,
-        TestDataIntegrity
+        TestDataIntegrity,
+        TestPostgresBatchWrites,
+        TestCSVFlattening,
+        TestBidPrefilter,
+        TestJSONLRoundTrip
     ]
     
     for test_class in test_classes:
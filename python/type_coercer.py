@@ -7,6 +7,16 @@ from datetime import datetime
 from typing import Dict, Any
 import re
 
+# Thousands separators and whitespace stripped from estimated values
+VALUE_SEPARATOR_RE = re.compile(r'[,\s]')
+
+# Date formats tried in order by parse_date
+DATE_FORMATS = (
+    '%a %b %d %H:%M:%S %Z %Y',  # Mon Nov 17 16:51:52 GMT 2025
+    '%d/%m/%Y %H:%M',           # 01/07/2025 12:00
+    '%d/%m/%Y',                 # 01/07/2025
+)
+
 
 def coerce_types(record: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -45,7 +55,7 @@ def coerce_types(record: Dict[str, Any]) -> Dict[str, Any]:
         value_str = coerced.get('estimated_value', '')
         if value_str:
             # Remove commas and convert to float
-            value_clean = re.sub(r'[,\s]', '', str(value_str))
+            value_clean = VALUE_SEPARATOR_RE.sub('', str(value_str))
             coerced['estimated_value_numeric'] = float(value_clean)
         else:
             coerced['estimated_value_numeric'] = None
@@ -87,18 +97,10 @@ def parse_date(date_str: str) -> str:
         return None
     
     try:
-        # Try parsing the eTenders format
-        # Example: "Mon Nov 17 16:51:52 GMT 2025"
-        formats = [
-            '%a %b %d %H:%M:%S %Z %Y',  # Mon Nov 17 16:51:52 GMT 2025
-            '%a %b %d %H:%M:%S %Z %Y',  # Mon Nov 17 16:51:52 IST 2025
-            '%d/%m/%Y %H:%M',           # 01/07/2025 12:00
-            '%d/%m/%Y',                 # 01/07/2025
-        ]
-        
-        for fmt in formats:
+        date_str = date_str.strip()
+        for fmt in DATE_FORMATS:
             try:
-                dt = datetime.strptime(date_str.strip(), fmt)
+                dt = datetime.strptime(date_str, fmt)
                 return dt.isoformat()
             except ValueError:
                 continue